@@ -0,0 +1,178 @@
+"""
+Batch assessment runner.
+
+Re-scores a manifest of stored image sets through an async worker pool, for
+example after a prompt change. The manifest is JSONL with one job per line:
+
+    {"id": "job-1", "images": ["path/a.jpg", "path/b.jpg", "path/c.jpg"]}
+    {"id": "job-2", "user_id": "alice"}
+
+Results are streamed to the output JSONL as each job finishes. The output
+file doubles as the checkpoint: on restart, jobs already recorded as "ok"
+are skipped, so an interrupted run resumes where it stopped.
+
+    python -m backend.app.services.llm_pipeline.batch manifest.jsonl results.jsonl --workers 16
+    python -m backend.app.services.llm_pipeline.batch manifest.jsonl results.jsonl --dry-run
+    python -m backend.app.services.llm_pipeline.batch manifest.jsonl results.jsonl --metrics-out stages.prom
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from backend.app.services.llm_pipeline.facial_analysis import FacialAnalyzer
+from backend.app.services.llm_pipeline.instrumentation import PrometheusSink, set_sink
+from backend.app.services.llm_pipeline.rate_limit import AdaptiveTokenBucket
+
+
+def load_manifest(manifest_path):
+    """Yield manifest entries; each needs an 'id' and either 'images' or 'user_id'."""
+    with open(manifest_path, "r") as manifest:
+        for line_number, line in enumerate(manifest, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "id" not in entry or not ("images" in entry or "user_id" in entry):
+                raise ValueError(f"{manifest_path}:{line_number}: entry needs 'id' and 'images' or 'user_id'")
+            yield entry
+
+
+def completed_ids(output_path):
+    """Ids already recorded as successful in a previous run's output."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r") as output:
+        for line in output:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+async def run_entry(analyzer, entry):
+    if "images" in entry:
+        return await analyzer.analyze_async(entry["images"])
+    return await analyzer.analyze_user_async(entry["user_id"])
+
+
+async def run_batch(entries, output_path, analyzer, workers=8, progress_every=100):
+    """
+    Run every entry not already completed in `output_path` and append one JSON
+    record per job. Returns a summary dict.
+    """
+    done = completed_ids(output_path)
+    queue = asyncio.Queue(maxsize=workers * 2)
+    stats = {"ok": 0, "error": 0, "skipped": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a") as output:
+
+        def record(result):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            finished = stats["ok"] + stats["error"]
+            if progress_every and finished % progress_every == 0:
+                rate = finished / (time.perf_counter() - started)
+                print(f"  {finished} done ({stats['error']} failed), {rate:.1f} assessments/s")
+
+        async def produce():
+            for entry in entries:
+                if entry["id"] in done:
+                    stats["skipped"] += 1
+                    continue
+                await queue.put(entry)
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def work():
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                job_started = time.perf_counter()
+                try:
+                    ratings = await run_entry(analyzer, entry)
+                    stats["ok"] += 1
+                    record({"id": entry["id"], "status": "ok", "result": ratings.to_dict(),
+                            "seconds": round(time.perf_counter() - job_started, 3)})
+                except Exception as e:
+                    stats["error"] += 1
+                    record({"id": entry["id"], "status": "error", "error": f"{type(e).__name__}: {e}",
+                            "seconds": round(time.perf_counter() - job_started, 3)})
+
+        await asyncio.gather(produce(), *(work() for _ in range(workers)))
+
+    elapsed = time.perf_counter() - started
+    processed = stats["ok"] + stats["error"]
+    stats["seconds"] = elapsed
+    stats["throughput"] = processed / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def build_analyzer(args):
+    # Start at the configured rate and back off from there if the provider returns 429s
+    gemini_limiter = AdaptiveTokenBucket(args.gemini_rps, max_rate=args.gemini_rps) if args.gemini_rps else None
+    llama_limiter = AdaptiveTokenBucket(args.llama_rps, max_rate=args.llama_rps) if args.llama_rps else None
+
+    cache = None
+    if args.cache_db:
+        from backend.app.services.llm_pipeline.result_cache import AssessmentCache, SQLiteCacheBackend
+        cache = AssessmentCache(SQLiteCacheBackend(args.cache_db))
+
+    if args.dry_run:
+        from backend.app.services.llm_pipeline.stub_llm import StubChatModel, StubOpenAIClient
+        return FacialAnalyzer(
+            gemini_llm=StubChatModel(latency=args.stub_latency),
+            llama_client=StubOpenAIClient(latency=args.stub_latency),
+            gemini_limiter=gemini_limiter, llama_limiter=llama_limiter, cache=cache,
+        )
+
+    return FacialAnalyzer(gemini_limiter=gemini_limiter, llama_limiter=llama_limiter, cache=cache)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score a manifest of image sets.")
+    parser.add_argument("manifest", help="JSONL manifest of jobs")
+    parser.add_argument("output", help="JSONL results file (appended; also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent assessments")
+    parser.add_argument("--gemini-rps", type=float, default=5.0, help="Gemini requests/second (0 = unlimited)")
+    parser.add_argument("--llama-rps", type=float, default=1.0, help="HF router requests/second (0 = unlimited)")
+    parser.add_argument("--cache-db", help="SQLite assessment cache to read from and fill")
+    parser.add_argument("--dry-run", action="store_true", help="Use stub models instead of the real providers")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="Seconds per stub model call")
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--metrics-out", help="Write per-stage Prometheus metrics here when the run ends")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    metrics = None
+    if args.metrics_out:
+        metrics = PrometheusSink()
+        set_sink(metrics)
+
+    analyzer = build_analyzer(args)
+    stats = asyncio.run(run_batch(load_manifest(args.manifest), args.output, analyzer,
+                                  workers=args.workers, progress_every=args.progress_every))
+
+    if metrics is not None:
+        with open(args.metrics_out, "w") as metrics_file:
+            metrics_file.write(metrics.render())
+
+    print(f"✓ {stats['ok']} ok, {stats['error']} failed, {stats['skipped']} skipped (already done)")
+    print(f"  {stats['seconds']:.1f}s, {stats['throughput']:.2f} assessments/s")
+    return 1 if stats["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
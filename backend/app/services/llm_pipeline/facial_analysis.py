@@ -1,185 +1,462 @@
-from backend.app.services.llm_pipeline.image_helper import get_recent_images,get_only_recent_images
+from backend.app.services.llm_pipeline.image_helper import prepare_images, recent_images, FACIAL_IMAGES_PATH
+from backend.app.services.llm_pipeline.upload_index import get_upload_index
 import os
-from backend.app.services.llm_pipeline.prompts import (JAWLINE_PROMPT,SMILE_PROMPT,SKIN_PROMPT,CHEEKBONE_PROMPT,EYELINE_PROMPT)
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
-from PIL import Image
-import base64
-from openai import OpenAI
+from backend.app.services.llm_pipeline.prompts import RATING_PROMPT, FUSED_PROMPT
+from backend.app.services.llm_pipeline.feature_analysis import (analyze_features_async, analyze_features_fused_async,
+                                                                build_feature_message, iter_features_async, retry_invalid_features,
+                                                                DEFAULT_MAX_CONCURRENCY, DEFAULT_PARSE_RETRIES, FEATURE_PROMPTS)
+from backend.app.services.llm_pipeline.parsing import (AssessmentRatings, OutputParseError, parse_feature_output,
+                                                       parse_ratings)
+from backend.app.services.llm_pipeline.result_cache import assessment_cache_key
+from backend.app.services.llm_pipeline.image_preprocess import ImagePreprocessor
+from backend.app.services.llm_pipeline.providers import get_registry, GEMINI_MODEL, LLAMA_MODEL
+from backend.app.services.llm_pipeline.rate_limit import ProviderGuard, get_guard, guard_attempt, guarded_call
+from backend.app.services.llm_pipeline.hedging import HedgeRoute, Hedger, validator
+from backend.app.services.llm_pipeline.tokens import estimate_message_tokens, estimate_text_tokens
+from backend.app.services.llm_pipeline.instrumentation import (LoggingSink, finish_span, record_model_call, set_sink, span,
+                                                                start_span)
+import asyncio
+import json
+import logging
 import sys
+import time
+from dataclasses import asdict
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Fix the path to point to the correct location
-FACIAL_IMAGES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
-                                 'src', 'uploads', 'facial_images')
+def get_gemini_client():
+    """Return the process-wide Gemini client, creating it on first call."""
+    return get_registry().gemini(GEMINI_MODEL)
 
-def load_gemini_image():
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        api_key=os.getenv("GEMINI_API_KEY"),
-        temperature=0.3
-    )
+# How the Gemini findings are handed to the Llama rating stage:
+#   full           - the Gemini replies verbatim, plus all three images (original behaviour)
+#   structured     - only the parsed schema fields as compact JSON, plus the images
+#   findings_only  - only the parsed schema fields; no images are re-sent
+HANDOFF_MODES = ("full", "structured", "findings_only")
 
-gemini_llm=load_gemini_image()
+def build_llama_content(images, gemini_outputs, handoff="full"):
+    """Content parts for the Llama rating request, reusing the prepared image parts."""
+    if handoff not in HANDOFF_MODES:
+        raise ValueError(f"Unknown handoff mode {handoff!r}; expected one of {HANDOFF_MODES}")
 
-images=get_recent_images(FACIAL_IMAGES_PATH)
+    if handoff != "full":
+        gemini_outputs = {
+            feature: json.dumps(asdict(parse_feature_output(feature, output)), separators=(',', ':'))
+            for feature, output in gemini_outputs.items()
+        }
 
-gemini_jawline = gemini_llm.invoke([
-    {"role": "user", "content": [
-        {"type": "text", "text": JAWLINE_PROMPT},
-        *[{"type": "image_url", "image_url": f"data:image/jpeg;base64,{img['inlineData']['data']}"} for img in images]
+    image_contents = []
+    for i, image in enumerate(images[:3] if handoff != "findings_only" else [], 1):
+        view_type = "45-degree view" if i == 1 else "profile view" if i == 2 else "frontal view"
+        image_contents.extend([
+            image.openai_part,
+            {
+                "type": "text",
+                "text": f"Image {i}: {view_type}"
+            }
+        ])
 
-    ]}
-])
-jawline_gemini_output=gemini_jawline.content
+    analysis_prompt = RATING_PROMPT.format(**gemini_outputs)
 
-gemini_smile = gemini_llm.invoke([
-    {"role": "user", "content": [
-        {"type": "text", "text": SMILE_PROMPT},
-        *[{"type": "image_url", "image_url": f"data:image/jpeg;base64,{img['inlineData']['data']}"} for img in images]
+    # Add the prompt to image contents
+    image_contents.append({
+        "type": "text",
+        "text": analysis_prompt
+    })
+    return image_contents
 
-    ]}
-])
-smile_gemini_output=gemini_smile.content
+def build_llama_messages(images, gemini_outputs, handoff="full"):
+    return [{
+        "role": "user",
+        "content": build_llama_content(images, gemini_outputs, handoff)
+    }]
 
-gemini_skin = gemini_llm.invoke([
-    {"role": "user", "content": [
-        {"type": "text", "text": SKIN_PROMPT},
-        *[{"type": "image_url", "image_url": f"data:image/jpeg;base64,{img['inlineData']['data']}"} for img in images]
+def process_with_llama(images, gemini_outputs, client=None, handoff="full", attempt=0, model=LLAMA_MODEL):
+    print("Processing with Llama model...")
+    try:
+        if client is None:
+            # Shared pooled client, so repeat assessments reuse open connections
+            client = get_registry().llama()
 
-    ]}
-])
-skin_gemini_output=gemini_skin.content
+        print("Generating response...")
+        messages = build_llama_messages(images, gemini_outputs, handoff)
+        # A parse retry or a request the guard re-sends counts once
+        retried = attempt > 0 or guard_attempt() > 0
+        with span("llama", model=model, handoff=handoff, retries=int(retried)) as stage:
+            completion = client.chat.completions.create(
+                model=model,
+                messages=messages
+            )
+            content = completion.choices[0].message.content
+            record_model_call(stage, messages, completion, content)
 
-gemini_cheekbone = gemini_llm.invoke([
-    {"role": "user", "content": [
-        {"type": "text", "text": CHEEKBONE_PROMPT},
-        *[{"type": "image_url", "image_url": f"data:image/jpeg;base64,{img['inlineData']['data']}"} for img in images]
+        return content
 
-    ]}
-])
-cheekbone_gemini_output=gemini_cheekbone.content
+    except Exception as e:
+        print(f"Error processing with Llama: {e}")
+        raise
 
-gemini_eyeline = gemini_llm.invoke([
-    {"role": "user", "content": [
-        {"type": "text", "text": EYELINE_PROMPT},
-        *[{"type": "image_url", "image_url": f"data:image/jpeg;base64,{img['inlineData']['data']}"} for img in images]
+async def stream_llama_async(images, gemini_outputs, client=None, handoff="full", guard=None):
+    """
+    Yield the Llama rating text piece by piece as the model generates it.
+    `guard` covers opening the stream; once text has been yielded a failure
+    can no longer be retried transparently.
+    """
+    if client is None:
+        client = get_registry().llama_async()
 
-    ]}
-])
-eyeline_gemini_output=gemini_eyeline.content
+    messages = build_llama_messages(images, gemini_outputs, handoff)
+    # The span outlives several yields, so it is opened without becoming current
+    stage = start_span("llama.stream", model=LLAMA_MODEL, handoff=handoff)
+    pieces = []
+    try:
+        def open_stream():
+            # One span covers every attempt; it ends up with the guard's retry count
+            stage.set(retries=guard_attempt())
+            return client.chat.completions.create(
+                model=LLAMA_MODEL,
+                messages=messages,
+                stream=True
+            )
 
-def encode_image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+        stream = await guarded_call(guard, open_stream)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    except BaseException as e:
+        finish_span(stage, e)
+        raise
+    record_model_call(stage, messages, output="".join(pieces))
+    finish_span(stage)
 
-def process_with_llama(image_paths, gemini_outputs):
-    print("Processing with Llama model...")
-    try:
-        client = OpenAI(
-            base_url="https://router.huggingface.co/v1",
-            api_key=os.getenv("HF_TOKEN"),
+class FacialAnalyzer:
+    """
+    Runs a facial assessment over an explicit set of images.
+
+    Nothing is created on construction; model clients come from the
+    process-wide provider registry the first time a model call is made. If an
+    AssessmentCache is given, repeat assessments of the same image bytes with
+    the same prompts and models are answered from it without any model call.
+    An ImagePreprocessor, if given, downscales uploads before they are encoded.
+    Every Gemini and Llama request goes through a ProviderGuard: a rate
+    limiter that backs off on quota errors, retries with jittered exponential
+    backoff (honouring Retry-After) and a circuit breaker. By default the
+    process-wide guard for each provider/model is used; passing a TokenBucket
+    as `gemini_limiter`/`llama_limiter` gives this analyzer its own guard
+    around that bucket instead.
+    With `hedge=True` (or LLM_HEDGE=1) a Gemini feature call or Llama call
+    still running at its route's p90 latency (`hedge_quantile`) is
+    duplicated, and the first valid reply wins. The duplicate goes to the
+    fallback route if one is configured (`gemini_fallback_llm` or
+    GEMINI_FALLBACK_MODEL, `llama_fallback_model` or LLAMA_FALLBACK_MODEL),
+    which also takes over when the primary fails outright. A losing Llama
+    copy runs to completion in its thread; its reply is discarded.
+    With `fused=True` (or GEMINI_FUSED=1) the five features are requested in a
+    single Gemini call, falling back to per-feature calls for bad sections.
+
+    Every model reply is parsed into its typed schema. A reply that fails to
+    parse is retried on its own, up to `parse_retries` times, without
+    rerunning the rest of the pipeline.
+
+    `handoff` (or LLAMA_HANDOFF) picks one of HANDOFF_MODES for what the
+    Llama stage receives. Estimated tokens and latency per stage are logged
+    for every assessment so the modes can be compared.
+    """
+
+    def __init__(self, gemini_llm=None, max_concurrency=None, cache=None, preprocessor=None,
+                 uploads_root=FACIAL_IMAGES_PATH, llama_client=None, llama_async_client=None,
+                 gemini_limiter=None, llama_limiter=None, fused=None, parse_retries=DEFAULT_PARSE_RETRIES,
+                 handoff=None, gemini_guard=None, llama_guard=None, hedge=None, hedge_quantile=0.9,
+                 gemini_fallback_llm=None, llama_fallback_model=None):
+        self._gemini_llm = gemini_llm
+        self.llama_client = llama_client
+        self.llama_async_client = llama_async_client
+        gemini_model = getattr(gemini_llm, 'model', None) or GEMINI_MODEL
+        if gemini_guard is None:
+            gemini_guard = (ProviderGuard(f"gemini:{gemini_model}", limiter=gemini_limiter) if gemini_limiter
+                            else get_guard("gemini", gemini_model))
+        if llama_guard is None:
+            llama_guard = (ProviderGuard(f"llama:{LLAMA_MODEL}", limiter=llama_limiter) if llama_limiter
+                           else get_guard("llama", LLAMA_MODEL))
+        self.gemini_guard = gemini_guard
+        self.llama_guard = llama_guard
+
+        if hedge is None:
+            hedge = os.getenv("LLM_HEDGE", "0") == "1"
+        gemini_fallback_model = (getattr(gemini_fallback_llm, 'model', None) if gemini_fallback_llm is not None
+                                 else os.getenv("GEMINI_FALLBACK_MODEL"))
+        llama_fallback_model = llama_fallback_model or os.getenv("LLAMA_FALLBACK_MODEL")
+        self.fallback_models = []
+        self.gemini_hedger = self.llama_hedger = None
+        if hedge:
+            # A fallback can answer, so it is part of what produced a cached result
+            self.fallback_models = [model for model in (gemini_fallback_model, llama_fallback_model) if model]
+            gemini_fallback = None
+            if gemini_fallback_model:
+                get_fallback = ((lambda: gemini_fallback_llm) if gemini_fallback_llm is not None
+                                else (lambda: get_registry().gemini(gemini_fallback_model)))
+                gemini_fallback = HedgeRoute(f"gemini:{gemini_fallback_model}", get_fallback,
+                                             get_guard("gemini", gemini_fallback_model))
+            self.gemini_hedger = Hedger(
+                HedgeRoute(f"gemini:{gemini_model}", lambda: self.gemini_llm, self.gemini_guard),
+                gemini_fallback, quantile=hedge_quantile,
+            )
+            llama_fallback = None
+            if llama_fallback_model:
+                llama_fallback = HedgeRoute(f"llama:{llama_fallback_model}", lambda: llama_fallback_model,
+                                            get_guard("llama", llama_fallback_model))
+            self.llama_hedger = Hedger(
+                HedgeRoute(f"llama:{LLAMA_MODEL}", lambda: LLAMA_MODEL, self.llama_guard),
+                llama_fallback, quantile=hedge_quantile,
+            )
+        self.cache = cache
+        self.preprocessor = preprocessor
+        self.uploads_root = uploads_root
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self.max_concurrency = max_concurrency
+        if fused is None:
+            fused = os.getenv("GEMINI_FUSED", "0") == "1"
+        self.fused = fused
+        self.parse_retries = parse_retries
+        if handoff is None:
+            handoff = os.getenv("LLAMA_HANDOFF", "full")
+        if handoff not in HANDOFF_MODES:
+            raise ValueError(f"Unknown handoff mode {handoff!r}; expected one of {HANDOFF_MODES}")
+        self.handoff = handoff
+
+    @property
+    def gemini_llm(self):
+        if self._gemini_llm is None:
+            self._gemini_llm = get_gemini_client()
+        return self._gemini_llm
+
+    async def analyze_features_async(self, images):
+        """Run the five Gemini feature prompts over prepared images (fused or concurrently)."""
+        analyze = analyze_features_fused_async if self.fused else analyze_features_async
+        return await analyze(self.gemini_llm, images, self.max_concurrency, self.gemini_guard, self.parse_retries,
+                             self.gemini_hedger)
+
+    def analyze_features(self, images):
+        return asyncio.run(self.analyze_features_async(images))
+
+    async def _prepare(self, image_paths):
+        """Preprocess and encode the images; returns (images, cache key, cached result)."""
+        if len(image_paths) < 3:
+            raise ValueError(f"Found only {len(image_paths)} images. Need 3 for assessment.")
+
+        if self.preprocessor is not None:
+            with span("preprocess", images=len(image_paths)) as stage:
+                results = await asyncio.to_thread(self.preprocessor.process_all, image_paths)
+                image_paths = [result.path for result in results]
+                stage.set(bytes_saved=sum(result.bytes_saved for result in results))
+
+        # Each file is read and encoded once, then shared by all six model calls
+        with span("encode", images=len(image_paths)) as stage:
+            images = prepare_images(image_paths)
+            stage.set(bytes=sum(len(image.data) for image in images))
+
+        if self.cache is None:
+            return images, None, None
+        cache_key = self.cache_key(images)
+        return images, cache_key, self._cached_ratings(cache_key)
+
+    def _cached_ratings(self, cache_key):
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        try:
+            return AssessmentRatings.from_dict(cached)
+        except OutputParseError:
+            # Entry written before results were parsed; treat it as a miss
+            return None
+
+    async def _rate(self, images, gemini_outputs, first_attempt=0):
+        """
+        Llama stage with parsing; only this call is retried if its JSON is
+        unusable. Provider errors are retried separately by the guard.
+        `first_attempt` skips attempts already made elsewhere (the streamed one).
+        """
+        for attempt in range(first_attempt, self.parse_retries + 1):
+            def call(model):
+                return asyncio.to_thread(process_with_llama, images, gemini_outputs, self.llama_client,
+                                         self.handoff, attempt, model)
+
+            if self.llama_hedger is None:
+                output = await self.llama_guard.call(lambda: call(LLAMA_MODEL))
+            else:
+                output = await self.llama_hedger.call(call, validator(parse_ratings))
+            try:
+                with span("parse.ratings", attempt=attempt):
+                    return parse_ratings(output)
+            except OutputParseError as e:
+                if attempt == self.parse_retries:
+                    raise
+                print(f"Unparseable Llama output ({e}); re-requesting ratings")
+
+    async def analyze_async(self, image_paths):
+        """
+        Full assessment for the given image paths: Gemini features, then Llama
+        ratings. Returns AssessmentRatings.
+        """
+        with span("assessment", fused=self.fused, handoff=self.handoff) as root:
+            images, cache_key, cached = await self._prepare(image_paths)
+            root.set(cached=cached is not None)
+            if cached is not None:
+                return cached
+
+            started = time.perf_counter()
+            gemini_outputs = await self.analyze_features_async(images)
+            features_done = time.perf_counter()
+            ratings = await self._rate(images, gemini_outputs)
+            self.log_usage(images, gemini_outputs, features_done - started, time.perf_counter() - features_done)
+
+            if cache_key is not None:
+                self.cache.set(cache_key, ratings.to_dict())
+            return ratings
+
+    def stage_usage(self, images, gemini_outputs):
+        """
+        Estimated input/output tokens per stage for one assessment (first
+        attempts only; parse retries are not included).
+        """
+        prompts = [FUSED_PROMPT] if self.fused else FEATURE_PROMPTS.values()
+        return {
+            "gemini_input_tokens": sum(estimate_message_tokens(build_feature_message(prompt, images))
+                                       for prompt in prompts),
+            "gemini_output_tokens": sum(estimate_text_tokens(output) for output in gemini_outputs.values()),
+            "llama_input_tokens": estimate_message_tokens(build_llama_messages(images, gemini_outputs, self.handoff)),
+        }
+
+    def log_usage(self, images, gemini_outputs, features_seconds, ratings_seconds):
+        usage = self.stage_usage(images, gemini_outputs)
+        logger.info(
+            "assessment handoff=%s fused=%s gemini_in~%d gemini_out~%d llama_in~%d tokens; "
+            "features %.2fs, ratings %.2fs",
+            self.handoff, self.fused, usage["gemini_input_tokens"], usage["gemini_output_tokens"],
+            usage["llama_input_tokens"], features_seconds, ratings_seconds,
         )
+        return usage
 
-        # Prepare base64 images
-        image_contents = []
-        for i, path in enumerate(image_paths[:3], 1):
-            base64_image = encode_image_to_base64(path)
-            view_type = "45-degree view" if i == 1 else "profile view" if i == 2 else "frontal view"
-            image_contents.extend([
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}"
-                    }
-                },
-                {
-                    "type": "text",
-                    "text": f"Image {i}: {view_type}"
-                }
-            ])
-
-        analysis_prompt = f"""
-        Based on the Gemini analysis:
-
-        JAWLINE: {gemini_outputs['jawline']}
-        SMILE: {gemini_outputs['smile']}
-        SKIN: {gemini_outputs['skin']}
-        CHEEKBONES: {gemini_outputs['cheekbone']}
-        EYELINE: {gemini_outputs['eyeline']}
-
-        Analyze each feature compared to professional model standards and provide a rating out of 10. 
-        Return the response in this exact JSON format:
-
-        {{
-            "jawline": {{
-                "rating": <number>,
-                "description": "<detailed explanation>"
-            }},
-            "smile": {{
-                "rating": <number>,
-                "description": "<detailed explanation>"
-            }},
-            "skin": {{
-                "rating": <number>,
-                "description": "<detailed explanation>"
-            }},
-            "cheekbones": {{
-                "rating": <number>,
-                "description": "<detailed explanation>"
-            }},
-            "eyeline": {{
-                "rating": <number>,
-                "description": "<detailed explanation>"
-            }}
-        }}
-
-        Be brutally honest in your ratings and descriptions. Only return the JSON, no other text.
+    async def stream_async(self, image_paths):
         """
+        Async generator of assessment events, each yielded as soon as it exists:
 
-        # Add the prompt to image contents
-        image_contents.append({
-            "type": "text",
-            "text": analysis_prompt
-        })
+          {"type": "feature", "feature": name, "findings": dict}   once per feature, in completion order
+          {"type": "ratings_delta", "delta": text}                 Llama rating tokens as they stream
+          {"type": "ratings", "ratings": dict, "cached": bool}     the parsed final ratings
 
-        print("Generating response...")
-        completion = client.chat.completions.create(
-            model="meta-llama/Llama-4-Scout-17B-16E-Instruct:groq",
-            messages=[{
-                "role": "user",
-                "content": image_contents
-            }]
+        A cache hit yields only the final "ratings" event. Features whose reply
+        fails to parse are held back, re-requested, and yielded once valid.
+        """
+        images, cache_key, cached = await self._prepare(image_paths)
+        if cached is not None:
+            yield {"type": "ratings", "ratings": cached.to_dict(), "cached": True}
+            return
+
+        started = time.perf_counter()
+        if self.fused:
+            # One request carries every feature, so they all arrive together
+            gemini_outputs = await self.analyze_features_async(images)
+            for feature, output in gemini_outputs.items():
+                yield self._feature_event(feature, output)
+        else:
+            gemini_outputs = {}
+            pending = []
+            async for feature, output in iter_features_async(self.gemini_llm, images, self.max_concurrency,
+                                                             self.gemini_guard, self.gemini_hedger):
+                gemini_outputs[feature] = output
+                try:
+                    event = self._feature_event(feature, output)
+                except OutputParseError:
+                    pending.append(feature)
+                    continue
+                yield event
+            if pending:
+                await retry_invalid_features(self.gemini_llm, images, gemini_outputs, self.max_concurrency,
+                                             self.gemini_guard, self.parse_retries, self.gemini_hedger)
+                for feature in pending:
+                    yield self._feature_event(feature, gemini_outputs[feature])
+
+        features_done = time.perf_counter()
+        pieces = []
+        async for delta in stream_llama_async(images, gemini_outputs, self.llama_async_client, self.handoff,
+                                              self.llama_guard):
+            pieces.append(delta)
+            yield {"type": "ratings_delta", "delta": delta}
+
+        try:
+            with span("parse.ratings", attempt=0):
+                ratings = parse_ratings("".join(pieces))
+        except OutputParseError as e:
+            if not self.parse_retries:
+                raise
+            print(f"Unparseable Llama output ({e}); re-requesting ratings")
+            # The streamed request was attempt 0
+            ratings = await self._rate(images, gemini_outputs, first_attempt=1)
+        self.log_usage(images, gemini_outputs, features_done - started, time.perf_counter() - features_done)
+
+        if cache_key is not None:
+            self.cache.set(cache_key, ratings.to_dict())
+        yield {"type": "ratings", "ratings": ratings.to_dict(), "cached": False}
+
+    @staticmethod
+    def _feature_event(feature, output):
+        findings = parse_feature_output(feature, output)
+        return {"type": "feature", "feature": feature, "findings": asdict(findings)}
+
+    def cache_key(self, images):
+        gemini_model = getattr(self._gemini_llm, 'model', None) or GEMINI_MODEL
+        return assessment_cache_key(
+            (image.sha256 for image in images),
+            [*FEATURE_PROMPTS.values(), *([FUSED_PROMPT] if self.fused else []), RATING_PROMPT,
+             f"handoff:{self.handoff}"],
+            [gemini_model, LLAMA_MODEL, *self.fallback_models],
         )
 
-        return completion.choices[0].message.content
+    def analyze(self, image_paths):
+        return asyncio.run(self.analyze_async(image_paths))
 
-    except Exception as e:
-        print(f"Error processing with Llama: {e}")
-        raise
+    def analyze_directory(self, folder_path, count=3):
+        """Assess the `count` most recent uploads in a folder."""
+        with span("discovery", count=count):
+            image_paths = get_upload_index(folder_path).recent(count)
+        return self.analyze(image_paths)
 
-if __name__ == "__main__":
-    try:
-        # Collect Gemini outputs
-        gemini_outputs = {
-            'jawline': jawline_gemini_output,
-            'smile': smile_gemini_output,
-            'skin': skin_gemini_output,
-            'cheekbone': cheekbone_gemini_output,
-            'eyeline': eyeline_gemini_output
-        }
+    async def analyze_user_async(self, user_id, count=3):
+        """Assess the `count` most recent uploads in one user's namespace."""
+        with span("discovery", count=count):
+            image_paths = await asyncio.to_thread(recent_images, user_id, count, self.uploads_root)
+        return await self.analyze_async(image_paths)
 
-        # Get image paths
-        image_paths = get_only_recent_images(FACIAL_IMAGES_PATH)
-        if len(image_paths) < 3:
-            raise ValueError(f"Found only {len(image_paths)} images. Need 3 for assessment.")
+    def analyze_user(self, user_id, count=3):
+        return asyncio.run(self.analyze_user_async(user_id, count))
 
-        # Process with Llama
-        llama_output = process_with_llama(image_paths, gemini_outputs)
+    async def analyze_users_async(self, user_ids, max_parallel=4):
+        """
+        Assess several users at once, at most `max_parallel` at a time.
+
+        Returns user id -> result; a failed assessment maps to its exception
+        instead of aborting the others.
+        """
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def run(user_id):
+            async with semaphore:
+                return await self.analyze_user_async(user_id)
+
+        results = await asyncio.gather(*(run(user_id) for user_id in user_ids), return_exceptions=True)
+        return dict(zip(user_ids, results))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    set_sink(LoggingSink())
+    try:
+        ratings = FacialAnalyzer(preprocessor=ImagePreprocessor()).analyze_directory(FACIAL_IMAGES_PATH)
         print("\nLlama Model Output:")
-        print(llama_output)
+        print(json.dumps(ratings.to_dict(), indent=2))
 
     except Exception as e:
         print(f"Failed to process with Llama: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,199 @@
+import asyncio
+import json
+from dataclasses import asdict
+
+from backend.app.services.llm_pipeline.prompts import (JAWLINE_PROMPT,SMILE_PROMPT,SKIN_PROMPT,CHEEKBONE_PROMPT,EYELINE_PROMPT,
+                                                       FUSED_PROMPT,FUSED_SCHEMA)
+from backend.app.services.llm_pipeline.parsing import OutputParseError, build_findings, extract_json, parse_feature_output
+from backend.app.services.llm_pipeline.instrumentation import record_model_call, span
+from backend.app.services.llm_pipeline.hedging import validator
+from backend.app.services.llm_pipeline.rate_limit import guard_attempt, guarded_call
+
+# Feature name -> prompt, in the order the outputs are handed to the Llama stage
+FEATURE_PROMPTS = {
+    'jawline': JAWLINE_PROMPT,
+    'smile': SMILE_PROMPT,
+    'skin': SKIN_PROMPT,
+    'cheekbone': CHEEKBONE_PROMPT,
+    'eyeline': EYELINE_PROMPT,
+}
+
+# All five features are independent, so by default they all go out at once
+DEFAULT_MAX_CONCURRENCY = len(FEATURE_PROMPTS)
+
+# How many times a feature whose reply fails to parse is re-requested on its own
+DEFAULT_PARSE_RETRIES = 1
+
+
+def build_feature_message(prompt, images):
+    """
+    Build the single user message sent to Gemini for one feature prompt.
+
+    `images` are PreparedImage objects; their content parts are shared between
+    calls rather than re-encoded per prompt.
+    """
+    return [
+        {"role": "user", "content": [
+            {"type": "text", "text": prompt},
+            *[img.gemini_part for img in images]
+        ]}
+    ]
+
+
+async def analyze_features_async(llm, images, max_concurrency=DEFAULT_MAX_CONCURRENCY, guard=None,
+                                 retries=DEFAULT_PARSE_RETRIES, hedger=None):
+    """
+    Send every feature prompt to the model concurrently over prepared images.
+
+    At most `max_concurrency` requests are in flight at any time. Each
+    request goes through `guard` (a ProviderGuard) if one is given, for rate
+    limiting, retries on quota and server errors, and circuit breaking. With
+    a Hedger the calls go over its routes instead of `llm`/`guard`, and a
+    call slower than the primary's p90 is duplicated. Replies that do not parse into their feature's schema are
+    re-requested individually, up to `retries` times. Returns a dict of
+    feature name -> model output text, in FEATURE_PROMPTS order.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    outputs = dict(await asyncio.gather(*_feature_calls(llm, images, max_concurrency, guard, hedger=hedger)))
+    await retry_invalid_features(llm, images, outputs, max_concurrency, guard, retries, hedger)
+    return {name: outputs[name] for name in FEATURE_PROMPTS}
+
+
+async def retry_invalid_features(llm, images, outputs, max_concurrency=DEFAULT_MAX_CONCURRENCY, guard=None,
+                                 retries=DEFAULT_PARSE_RETRIES, hedger=None):
+    """
+    Validate `outputs` (feature name -> reply text) in place. Features that are
+    missing or fail to parse are re-requested on their own, never the whole
+    set. Returns the names that were re-requested; raises OutputParseError if
+    any is still invalid after `retries` attempts.
+    """
+    retried = []
+    for attempt in range(retries + 1):
+        failed = {}
+        with span("parse.features", attempt=attempt) as stage:
+            for name, prompt in FEATURE_PROMPTS.items():
+                if name not in outputs:
+                    failed[name] = (prompt, OutputParseError(name, "no output"))
+                    continue
+                try:
+                    parse_feature_output(name, outputs[name])
+                except OutputParseError as e:
+                    failed[name] = (prompt, e)
+            stage.set(failed=len(failed))
+        if not failed:
+            return retried
+        if attempt == retries:
+            raise next(iter(failed.values()))[1]
+
+        print(f"Unparseable output for {', '.join(failed)}; re-requesting those features")
+        retried.extend(name for name in failed if name not in retried)
+        prompts = {name: prompt for name, (prompt, _) in failed.items()}
+        outputs.update(await asyncio.gather(*_feature_calls(llm, images, max_concurrency, guard, prompts,
+                                                            attempt=attempt + 1, hedger=hedger)))
+
+
+async def iter_features_async(llm, images, max_concurrency=DEFAULT_MAX_CONCURRENCY, guard=None, hedger=None):
+    """
+    Like analyze_features_async, but yields (feature name, output) pairs in
+    completion order, as soon as each call returns.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    tasks = [asyncio.ensure_future(call) for call in _feature_calls(llm, images, max_concurrency, guard,
+                                                                     hedger=hedger)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Consumer stopped early or a call failed: don't leave requests running
+        for task in tasks:
+            task.cancel()
+
+
+async def analyze_features_fused_async(llm, images, max_concurrency=DEFAULT_MAX_CONCURRENCY, guard=None,
+                                       retries=DEFAULT_PARSE_RETRIES, hedger=None):
+    """
+    Ask for all five features in one request with a merged JSON schema.
+
+    The images are uploaded once instead of five times. Each section of the
+    reply is checked against the keys its prompt declares; only sections
+    that are missing or malformed are re-run as individual feature calls.
+    Returns the same feature name -> output dict as analyze_features_async,
+    with each output being that section's JSON text. The fused call itself is
+    not hedged; the per-feature repairs are.
+    """
+    messages = build_feature_message(FUSED_PROMPT, images)
+
+    async def invoke():
+        with span("gemini.fused", model=getattr(llm, "model", None), retries=int(guard_attempt() > 0)) as stage:
+            response = await _with_json_output(llm).ainvoke(messages)
+            record_model_call(stage, messages, response, response.content)
+        return response
+
+    response = await guarded_call(guard, invoke)
+    sections = parse_fused_response(response.content)
+
+    outputs = {}
+    for name in FEATURE_PROMPTS:
+        try:
+            outputs[name] = json.dumps(asdict(build_findings(name, sections.get(name))))
+        except OutputParseError:
+            pass
+
+    # Missing or malformed sections go through the per-feature path
+    await retry_invalid_features(llm, images, outputs, max_concurrency, guard, retries, hedger)
+    return {name: outputs[name] for name in FEATURE_PROMPTS}
+
+
+def parse_fused_response(content):
+    """Decode the fused reply into a dict of sections; anything unparseable yields {}."""
+    try:
+        return extract_json(content, "fused")
+    except OutputParseError:
+        return {}
+
+
+def _with_json_output(llm):
+    # Ask providers that support it (Gemini via LangChain) for schema-constrained JSON
+    bind = getattr(llm, "bind", None)
+    if bind is None:
+        return llm
+    return bind(response_mime_type="application/json", response_schema=FUSED_SCHEMA)
+
+
+def _feature_calls(llm, images, max_concurrency, guard, prompts=FEATURE_PROMPTS, attempt=0, hedger=None):
+    """
+    One coroutine per feature, each resolving to (feature name, output).
+    `attempt` > 0 marks parse retries: like a request the guard re-sends,
+    each one counts once in its span's `retries`.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(name, prompt):
+        messages = build_feature_message(prompt, images)
+
+        async def invoke(target):
+            # One span per attempt, opened after the semaphore and rate limiter
+            retried = attempt > 0 or guard_attempt() > 0
+            with span("gemini.feature", feature=name, model=getattr(target, "model", None), retries=int(retried)) as stage:
+                response = await target.ainvoke(messages)
+                record_model_call(stage, messages, response, response.content)
+            return response
+
+        async with semaphore:
+            if hedger is None:
+                response = await guarded_call(guard, lambda: invoke(llm))
+            else:
+                response = await hedger.call(invoke, validator(lambda reply: parse_feature_output(name, reply.content)))
+        return name, response.content
+
+    return [run(name, prompt) for name, prompt in prompts.items()]
+
+
+def analyze_features(llm, images, max_concurrency=DEFAULT_MAX_CONCURRENCY, guard=None,
+                     retries=DEFAULT_PARSE_RETRIES, hedger=None):
+    """Synchronous wrapper around analyze_features_async for script use."""
+    return asyncio.run(analyze_features_async(llm, images, max_concurrency, guard, retries, hedger))
@@ -0,0 +1,191 @@
+"""
+Hedged requests and provider fallback.
+
+Each route (a provider/model) keeps a latency histogram of its completed
+calls. A hedged call starts on the primary route; if it has not answered by
+that route's p90, a second copy goes to the alternate route (or the primary
+again when there is none) and the first valid answer wins. A primary that
+fails outright falls back to the alternate immediately. With the default
+quantile roughly one call in ten is duplicated, in exchange for cutting the
+slow tail that otherwise holds up the whole assessment.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+
+from backend.app.services.llm_pipeline.rate_limit import guarded_call
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (about 10% resolution). Once `max_samples`
+    have been seen all counts are halved, so old samples fade and the
+    quantiles follow the provider's current behaviour.
+    """
+
+    def __init__(self, min_value=0.001, max_value=600.0, growth=1.1, max_samples=2000):
+        bounds = [min_value]
+        while bounds[-1] < max_value:
+            bounds.append(bounds[-1] * growth)
+        self.bounds = bounds
+        self.counts = [0.0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.total += 1
+            if self.total >= self.max_samples:
+                self.counts = [count / 2 for count in self.counts]
+                self.total /= 2
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, or None when empty."""
+        with self._lock:
+            if not self.total:
+                return None
+            target = q * self.total
+            cumulative = 0.0
+            for i, count in enumerate(self.counts):
+                cumulative += count
+                if cumulative >= target and count:
+                    return self.bounds[min(i, len(self.bounds) - 1)]
+            return self.bounds[-1]
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(name):
+    """The process-wide histogram for one route, shared by every analyzer."""
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = LatencyHistogram()
+        return histogram
+
+
+class HedgeRoute:
+    """
+    One way to serve a call: `get_target` returns the client (or model name)
+    handed to the call function; it is resolved lazily so no client is built
+    until the route is used.
+    """
+
+    __slots__ = ('name', 'get_target', 'guard', 'histogram')
+
+    def __init__(self, name, get_target, guard=None):
+        self.name = name
+        self.get_target = get_target
+        self.guard = guard
+        self.histogram = get_latency_histogram(name)
+
+
+class Hedger:
+    """
+    Runs calls over a primary route with an optional alternate.
+
+    `quantile` sets the hedge delay from the primary's histogram; no hedges
+    are sent until it has `min_samples` calls. `budget` caps hedges at that
+    fraction of calls (plus one), so a provider that is slow across the board
+    does not get every request doubled.
+    """
+
+    def __init__(self, primary, alternate=None, quantile=0.9, min_samples=20, budget=0.2):
+        self.primary = primary
+        self.alternate = alternate
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.budget = budget
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "fallbacks": 0}
+
+    def hedge_delay(self):
+        histogram = self.primary.histogram
+        if histogram.total < self.min_samples:
+            return None
+        return histogram.quantile(self.quantile)
+
+    def _may_hedge(self):
+        return self.stats["hedged"] < self.budget * self.stats["calls"] + 1
+
+    async def _attempt(self, route, make_call, validate):
+        started = time.perf_counter()
+        target = route.get_target()
+        result = await guarded_call(route.guard, lambda: make_call(target))
+        route.histogram.record(time.perf_counter() - started)
+        if validate is not None:
+            validate(result)
+        return result
+
+    async def call(self, make_call, validate=None):
+        """
+        Await make_call(target) with hedging and fallback. `validate(result)`
+        raising marks a reply as unusable so the other copy can still win; if
+        no copy is valid, the first invalid reply is returned for the caller's
+        own handling, and if every copy raised, the first error is re-raised.
+        """
+        self.stats["calls"] += 1
+        backup = self.alternate or self.primary
+        primary_task = asyncio.ensure_future(self._attempt(self.primary, make_call, validate))
+        tasks = {primary_task}
+        backup_task = None
+        hedged = False
+        errors = []
+        invalid = None
+
+        def launch_backup():
+            nonlocal backup_task
+            backup_task = asyncio.ensure_future(self._attempt(backup, make_call, validate))
+            tasks.add(backup_task)
+
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._may_hedge():
+                    self.stats["hedged"] += 1
+                    hedged = True
+                    launch_backup()
+
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedged and task is backup_task:
+                            self.stats["hedge_won"] += 1
+                        return task.result()
+                    errors.append(error)
+                    if invalid is None and hasattr(error, "hedge_result"):
+                        invalid = error.hedge_result
+                    if backup_task is None and self.alternate is not None:
+                        # Primary failed before any hedge: fall back right away
+                        self.stats["fallbacks"] += 1
+                        launch_backup()
+            if invalid is not None:
+                return invalid
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def validator(check):
+    """
+    Wrap `check(result)` (which raises on an unusable reply) for Hedger.call,
+    attaching the reply to the error so it can still be returned if no copy
+    turns out valid.
+    """
+    def validate(result):
+        try:
+            check(result)
+        except Exception as e:
+            e.hedge_result = result
+            raise
+    return validate
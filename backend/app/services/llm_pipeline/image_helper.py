@@ -1,7 +1,23 @@
 import os
-import glob
 import base64
+import hashlib
 import operator
+import re
+import uuid
+from backend.app.services.llm_pipeline.upload_index import most_recent_images, get_upload_index
+
+# Shared upload root; each user gets a subdirectory underneath it
+FACIAL_IMAGES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))),
+                                 'src', 'uploads', 'facial_images')
+
+# User ids become directory names, so only allow a safe, bounded alphabet
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+IMAGE_MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png'
+}
 
 def get_recent_images(user_folder_path, count=3):
     """
@@ -9,36 +25,24 @@ def get_recent_images(user_folder_path, count=3):
     reads them, and returns a list of Base64-encoded strings and their MIME types.
     """
     
-    # Define a list of expected image extensions
-    IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png']
-    
-    all_files = []
-    
-    # 1. Identify and Locate Files
-    for ext in IMAGE_EXTENSIONS:
-        # glob finds all files matching the pattern
-        all_files.extend(glob.glob(os.path.join(user_folder_path, ext)))
-    
-    if not all_files:
-        return [] 
-    all_files.sort(key=os.path.getmtime, reverse=True)
-    
-    # Select the top N (3) recent files
-    recent_files = all_files[:count]
+    # Single os.scandir pass, keeping only the top N (3) by mtime
+    recent_files = most_recent_images(user_folder_path, count)
     
+    return encode_image_files(recent_files)
+
+def encode_image_files(file_paths):
+    """
+    Reads the given image files and returns a list of Base64-encoded strings
+    and their MIME types, in the structure expected by the API call.
+    """
     base64_parts = []
-    base64_list = []
     # 3. Select, Read, and Convert
-    for file_path in recent_files:
+    for file_path in file_paths:
         try:
             # Determine MIME type (required for the API call)
             # A simple lookup based on extension is often enough
             extension = os.path.splitext(file_path)[1].lower()
-            mime_type = {
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png'
-            }.get(extension, 'application/octet-stream')
+            mime_type = IMAGE_MIME_TYPES.get(extension, 'application/octet-stream')
             
             # Read the binary data
             with open(file_path, "rb") as image_file:
@@ -63,26 +67,90 @@ def get_recent_images(user_folder_path, count=3):
             
     return base64_parts
 
+def user_upload_dir(user_id, root=FACIAL_IMAGES_PATH):
+    """Directory holding one user's (or session's) uploads."""
+    if not isinstance(user_id, str) or not USER_ID_PATTERN.match(user_id):
+        raise ValueError(f"Invalid user id: {user_id!r}")
+    return os.path.join(root, user_id)
+
+def recent_images(user_id, count=3, root=FACIAL_IMAGES_PATH):
+    """
+    The 'count' most recent uploads for one user, newest first. Only that
+    user's folder is indexed, so the cost does not grow with other users.
+    """
+    return get_upload_index(user_upload_dir(user_id, root)).recent(count)
+
+def store_upload(user_id, data, extension='.jpg', root=FACIAL_IMAGES_PATH):
+    """
+    Writes an upload into the user's folder under a unique name and registers
+    it with the folder's index. Returns the stored path.
+    """
+    extension = extension.lower()
+    if extension not in IMAGE_MIME_TYPES:
+        raise ValueError(f"Unsupported image extension: {extension}")
+
+    folder = user_upload_dir(user_id, root)
+    os.makedirs(folder, exist_ok=True)
+    index = get_upload_index(folder)
+    # Taken before writing, so the index can tell our change from other writers'
+    folder_mtime_ns = os.stat(folder).st_mtime_ns
+    path = os.path.join(folder, f"{uuid.uuid4().hex}{extension}")
+    # Write under a dotfile name first so a partial file is never listed
+    temp_path = os.path.join(folder, f".{uuid.uuid4().hex}.tmp")
+    with open(temp_path, "wb") as upload_file:
+        upload_file.write(data)
+    os.replace(temp_path, path)
+
+    index.add(path, folder_mtime_ns=folder_mtime_ns)
+    return path
+
 def get_only_recent_images(user_folder_path, count=3):
     """
-    Identifies the 'count' most recently modified image files in a directory,
-    reads them, and returns a list of Base64-encoded strings and their MIME types.
+    Identifies the 'count' most recently modified image files in a directory
+    and returns their paths, newest first.
     """
-    
-    # Define a list of expected image extensions
-    IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png']
-    
-    all_files = []
-    
-    # 1. Identify and Locate Files
-    for ext in IMAGE_EXTENSIONS:
-        # glob finds all files matching the pattern
-        all_files.extend(glob.glob(os.path.join(user_folder_path, ext)))
-    
-    if not all_files:
-        return [] 
-    all_files.sort(key=os.path.getmtime, reverse=True)
-    
-    # Select the top N (3) recent files
-    recent_files = all_files[:count]
-    return recent_files
\ No newline at end of file
+    return most_recent_images(user_folder_path, count)
+
+class PreparedImage:
+    """
+    An image read and encoded exactly once for the whole assessment.
+
+    Holds the Base64 payload plus the ready-made content parts for both the
+    Gemini (LangChain) and the OpenAI-compatible Llama message formats, so
+    every prompt call reuses the same strings instead of rebuilding them.
+    """
+
+    __slots__ = ('path', 'mime_type', 'data', 'sha256', 'data_url', 'gemini_part', 'openai_part')
+
+    def __init__(self, path, mime_type, data, sha256=None):
+        self.path = path
+        self.mime_type = mime_type
+        self.data = data
+        # Content hash of the original file bytes, used as the result-cache key
+        self.sha256 = sha256 if sha256 is not None else hashlib.sha256(base64.b64decode(data)).hexdigest()
+        self.data_url = f"data:{mime_type};base64,{data}"
+        self.gemini_part = {"type": "image_url", "image_url": self.data_url}
+        self.openai_part = {"type": "image_url", "image_url": {"url": self.data_url}}
+
+    @classmethod
+    def from_file(cls, file_path):
+        extension = os.path.splitext(file_path)[1].lower()
+        mime_type = IMAGE_MIME_TYPES.get(extension, 'application/octet-stream')
+        with open(file_path, "rb") as image_file:
+            binary_data = image_file.read()
+        data = base64.b64encode(binary_data).decode('ascii')
+        return cls(file_path, mime_type, data, hashlib.sha256(binary_data).hexdigest())
+
+
+def prepare_images(file_paths):
+    """
+    Reads and encodes each file once. Unreadable files are skipped, matching
+    encode_image_files.
+    """
+    prepared = []
+    for file_path in file_paths:
+        try:
+            prepared.append(PreparedImage.from_file(file_path))
+        except IOError:
+            print(f"Error reading file: {file_path}")
+    return prepared
@@ -0,0 +1,102 @@
+import os
+import threading
+
+# Processed copies live in a hidden folder beside the originals, so the
+# upload folder scans never pick them up as new uploads
+PREPROCESSED_DIRNAME = '.preprocessed'
+
+
+class PreprocessResult:
+    """Outcome of preprocessing one upload."""
+
+    __slots__ = ('source_path', 'path', 'original_bytes', 'processed_bytes', 'from_cache')
+
+    def __init__(self, source_path, path, original_bytes, processed_bytes, from_cache):
+        self.source_path = source_path
+        self.path = path
+        self.original_bytes = original_bytes
+        self.processed_bytes = processed_bytes
+        self.from_cache = from_cache
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.processed_bytes
+
+
+class ImagePreprocessor:
+    """
+    Downscales and recompresses uploads before they are sent to the models.
+
+    Images are resized so the longest side is at most `max_side` pixels,
+    optionally rotated upright from the EXIF orientation tag, and re-encoded
+    as JPEG at `quality` without any EXIF metadata. Results are written to a
+    `.preprocessed` folder next to the original, named after the source's
+    full filename, size and modification time, and reused until either
+    changes. Older copies of the same source are removed when it is redone.
+    """
+
+    def __init__(self, max_side=1024, quality=85, normalize_orientation=True):
+        if max_side < 1:
+            raise ValueError("max_side must be at least 1")
+        if not 1 <= quality <= 95:
+            raise ValueError("quality must be between 1 and 95")
+        self.max_side = max_side
+        self.quality = quality
+        self.normalize_orientation = normalize_orientation
+
+    def _prefix(self, source_path):
+        # The full filename, extension included, so face.jpg and face.png
+        # in one folder never share a processed copy
+        folder, filename = os.path.split(source_path)
+        settings = f"{self.max_side}px-q{self.quality}{'-o' if self.normalize_orientation else ''}"
+        return os.path.join(folder, PREPROCESSED_DIRNAME, f"{filename}.{settings}.")
+
+    def output_path(self, source_path, source_stat=None):
+        source_stat = source_stat or os.stat(source_path)
+        return f"{self._prefix(source_path)}{source_stat.st_size}-{source_stat.st_mtime_ns}.jpg"
+
+    def _remove_stale(self, source_path, output_path):
+        prefix = self._prefix(source_path)
+        folder, name_prefix = os.path.split(prefix)
+        for entry in os.scandir(folder):
+            if entry.name.startswith(name_prefix) and entry.name.endswith('.jpg') and entry.path != output_path:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def process(self, source_path):
+        source_stat = os.stat(source_path)
+        output_path = self.output_path(source_path, source_stat)
+
+        try:
+            return PreprocessResult(source_path, output_path, source_stat.st_size,
+                                    os.path.getsize(output_path), from_cache=True)
+        except FileNotFoundError:
+            pass
+
+        from PIL import Image, ImageOps
+
+        with Image.open(source_path) as image:
+            if self.normalize_orientation:
+                image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # Write to a temp name first so a concurrent reader never sees a partial file
+            temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            image.save(temp_path, format='JPEG', quality=self.quality, optimize=True)
+            os.replace(temp_path, output_path)
+        self._remove_stale(source_path, output_path)
+
+        return PreprocessResult(source_path, output_path, source_stat.st_size,
+                                os.path.getsize(output_path), from_cache=False)
+
+    def process_all(self, source_paths):
+        results = [self.process(path) for path in source_paths]
+        for result in results:
+            origin = "cached" if result.from_cache else "resized"
+            print(f"{os.path.basename(result.source_path)}: {result.original_bytes} -> "
+                  f"{result.processed_bytes} bytes ({result.bytes_saved} saved, {origin})")
+        return results
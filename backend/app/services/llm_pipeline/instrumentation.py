@@ -0,0 +1,240 @@
+"""
+Per-stage instrumentation for the facial analysis pipeline.
+
+Stages are wrapped in OpenTelemetry-style spans (trace id, span id, parent,
+start/end, attributes, status). Finished spans go to the process-wide sink,
+which does nothing by default. Swap it with set_sink() for an in-memory
+recorder, a logger, a Prometheus exporter or a fan-out of several.
+
+Attributes recorded by the pipeline, where they apply:
+    bytes_sent, tokens_in, tokens_out, retries, feature, model, images
+
+`retries` is how many retried requests a model-call span covers: 1 on the
+span of a re-sent call (a parse retry or a ProviderGuard retry), and the
+guard's retry count on a span that spans every attempt, like llama.stream.
+Parse spans carry `attempt` instead, so a retry round is counted once.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from backend.app.services.llm_pipeline.tokens import (estimate_message_tokens, estimate_text_tokens, message_bytes,
+                                                      reported_usage)
+
+_current_span = contextvars.ContextVar("llm_pipeline_span", default=None)
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_time', 'end_time', 'attributes', 'status')
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+
+    @property
+    def duration(self):
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+            "parent_id": self.parent_id, "duration": self.duration,
+            "status": self.status, "attributes": self.attributes,
+        }
+
+
+class NullSink:
+    def record(self, span):
+        pass
+
+
+class InMemorySink:
+    """Keeps finished spans in a bounded list; handy for tests and debugging."""
+
+    def __init__(self, limit=10000):
+        self.limit = limit
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) > self.limit:
+                del self.spans[:len(self.spans) - self.limit]
+
+
+class LoggingSink:
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("llm_pipeline.spans")
+        self.level = level
+
+    def record(self, span):
+        attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        self.logger.log(self.level, "span %s %.3fs %s trace=%s %s",
+                        span.name, span.duration, span.status, span.trace_id, attributes)
+
+
+class MultiSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def record(self, span):
+        for sink in self.sinks:
+            sink.record(span)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class PrometheusSink:
+    """
+    Aggregates spans into Prometheus metrics, labelled by stage (span name):
+
+        llm_pipeline_stage_seconds          histogram of stage wall time
+        llm_pipeline_stage_bytes_sent_total counter
+        llm_pipeline_stage_tokens_total     counter, direction="in"|"out"
+        llm_pipeline_stage_retries_total    counter of retried requests
+        llm_pipeline_stage_errors_total     counter
+
+    render() returns the text exposition format for a /metrics endpoint; p95
+    per stage is then histogram_quantile(0.95, ...) on the server side.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}   # stage -> [bucket counts..., +Inf count, sum]
+        self._counters = {}     # (metric, labels tuple) -> value
+        self._lock = threading.Lock()
+
+    def _add(self, metric, labels, value):
+        key = (metric, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def record(self, span):
+        stage = span.name
+        duration = span.duration
+        attributes = span.attributes
+        with self._lock:
+            histogram = self._histograms.setdefault(stage, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[len(self.buckets)] += 1
+            histogram[-1] += duration
+
+            stage_label = (("stage", stage),)
+            if attributes.get("bytes_sent"):
+                self._add("llm_pipeline_stage_bytes_sent_total", stage_label, attributes["bytes_sent"])
+            if attributes.get("tokens_in"):
+                self._add("llm_pipeline_stage_tokens_total", stage_label + (("direction", "in"),), attributes["tokens_in"])
+            if attributes.get("tokens_out"):
+                self._add("llm_pipeline_stage_tokens_total", stage_label + (("direction", "out"),), attributes["tokens_out"])
+            if attributes.get("retries"):
+                self._add("llm_pipeline_stage_retries_total", stage_label, attributes["retries"])
+            if span.status == "error":
+                self._add("llm_pipeline_stage_errors_total", stage_label, 1)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP llm_pipeline_stage_seconds Wall time per pipeline stage.")
+            lines.append("# TYPE llm_pipeline_stage_seconds histogram")
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'llm_pipeline_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'llm_pipeline_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram[len(self.buckets)]}')
+                lines.append(f'llm_pipeline_stage_seconds_sum{{stage="{stage}"}} {histogram[-1]}')
+                lines.append(f'llm_pipeline_stage_seconds_count{{stage="{stage}"}} {histogram[len(self.buckets)]}')
+
+            declared = set()
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} counter")
+                    declared.add(metric)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{metric}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+_sink = NullSink()
+
+
+def get_sink():
+    return _sink
+
+
+def set_sink(sink):
+    """Install the process-wide sink; returns the previous one."""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def start_span(name, **attributes):
+    """
+    Open a span without making it current. For stages that cannot sit in a
+    `with` block, such as a stream consumed across an async generator's
+    yields; close it with finish_span().
+    """
+    parent = _current_span.get()
+    return Span(
+        name,
+        trace_id=parent.trace_id if parent is not None else os.urandom(16).hex(),
+        parent_id=parent.span_id if parent is not None else None,
+        attributes=attributes,
+    )
+
+
+def finish_span(current, error=None):
+    current.end_time = time.perf_counter()
+    if error is not None:
+        # A hedged call's losing copy or an abandoned stream is cancelled, not failed
+        cancelled = isinstance(error, (asyncio.CancelledError, GeneratorExit))
+        current.status = "cancelled" if cancelled else "error"
+        current.attributes["error"] = type(error).__name__
+    _sink.record(current)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a stage. Nested spans (including ones started in tasks or threads
+    spawned inside it) share the trace id and point at their parent.
+    """
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        finish_span(current, error)
+
+
+def record_model_call(current, messages, response=None, output=None):
+    """
+    Attach payload size and token counts for one model call to its span.
+    Provider-reported usage wins; otherwise tokens are estimated.
+    """
+    usage = reported_usage(response) if response is not None else None
+    if usage is None:
+        usage = (estimate_message_tokens(messages), estimate_text_tokens(output or ""))
+    current.set(bytes_sent=message_bytes(messages), tokens_in=usage[0], tokens_out=usage[1])
@@ -0,0 +1,160 @@
+"""
+In-process job queue for the assessment service.
+
+Submitted assessments wait in a bounded queue and are run by a fixed pool of
+worker tasks, so at most `workers` assessments hit the providers at once and
+a burst beyond `max_pending` is rejected instead of piling up. Each job keeps
+the events produced by FacialAnalyzer.stream_async, which lets a client poll
+for the final result or follow the events as they arrive.
+"""
+
+import asyncio
+import time
+import uuid
+
+from backend.app.services.llm_pipeline.image_helper import recent_images
+from backend.app.services.llm_pipeline.instrumentation import span
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when `max_pending` jobs are already waiting."""
+
+
+class Job:
+    __slots__ = ('id', 'user_id', 'count', 'status', 'events', 'result', 'error', 'created', 'finished', '_changed')
+
+    def __init__(self, user_id, count=3):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.count = count
+        self.status = "queued"
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    async def publish(self, event):
+        async with self._changed:
+            self.events.append(event)
+            if event["type"] == "ratings":
+                self.result = event["ratings"]
+            self._changed.notify_all()
+
+    async def finish(self, error=None):
+        async with self._changed:
+            if error is not None:
+                self.status = "failed"
+                self.error = f"{type(error).__name__}: {error}"
+            else:
+                self.status = "done"
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    async def follow(self):
+        """Yield every event from the start, then new ones until the job ends."""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) > sent or self.done)
+                pending = self.events[sent:]
+                finished = self.done
+            for event in pending:
+                yield event
+            sent += len(pending)
+            if finished and sent == len(self.events):
+                return
+
+    def to_dict(self):
+        return {
+            "id": self.id, "user_id": self.user_id, "status": self.status,
+            "result": self.result, "error": self.error,
+            "created": self.created, "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """
+    Runs assessments for submitted jobs on `workers` long-lived tasks that
+    share one FacialAnalyzer (and so one set of pooled provider clients).
+    Finished jobs are kept for `result_ttl` seconds for polling.
+    """
+
+    def __init__(self, analyzer, workers=8, max_pending=256, result_ttl=600):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.analyzer = analyzer
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+        self._last_expiry = 0.0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, user_id, count=3):
+        if self._queue is None:
+            raise RuntimeError("JobQueue.start() has not been awaited")
+        self._expire()
+        job = Job(user_id, count)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.max_pending} assessments already pending")
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stats(self):
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"workers": self.workers, "pending": self._queue.qsize() if self._queue else 0, "jobs": statuses}
+
+    def _expire(self):
+        # A full sweep at most once a second keeps submit O(1) under load
+        now = time.time()
+        if now - self._last_expiry < 1.0:
+            return
+        self._last_expiry = now
+        cutoff = now - self.result_ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                with span("discovery", count=job.count):
+                    image_paths = await asyncio.to_thread(recent_images, job.user_id, job.count,
+                                                          self.analyzer.uploads_root)
+                async for event in self.analyzer.stream_async(image_paths):
+                    await job.publish(event)
+            except asyncio.CancelledError:
+                await job.finish(RuntimeError("service shutting down"))
+                raise
+            except Exception as e:
+                await job.finish(e)
+            else:
+                await job.finish()
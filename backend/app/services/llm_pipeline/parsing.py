@@ -0,0 +1,147 @@
+import json
+import re
+from dataclasses import asdict, dataclass, fields, make_dataclass
+
+from backend.app.services.llm_pipeline.prompts import FEATURE_KEYS
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib parser gives identical results, just slower
+    orjson = None
+
+
+class OutputParseError(ValueError):
+    """A model reply could not be turned into the expected structure."""
+
+    def __init__(self, stage, message):
+        super().__init__(f"{stage}: {message}")
+        self.stage = stage
+
+
+def _loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"'})
+
+
+def extract_json(text, stage="output"):
+    """
+    Decode the JSON object in a model reply.
+
+    Tries a plain parse first; only on failure applies cheap repairs in turn:
+    strip Markdown code fences, cut to the outermost braces (dropping any
+    surrounding prose), straighten curly double quotes and remove trailing
+    commas. Raises OutputParseError if no object can be recovered.
+    """
+    candidate = text.strip()
+    repairs = (
+        lambda t: _FENCE.sub("", t).strip(),
+        lambda t: t[t.find("{"):t.rfind("}") + 1] if "{" in t and "}" in t else t,
+        lambda t: t.translate(_SMART_QUOTES),
+        lambda t: _TRAILING_COMMA.sub(r"\1", t),
+    )
+    for repair in (None, *repairs):
+        if repair is not None:
+            candidate = repair(candidate)
+        try:
+            value = _loads(candidate)
+        except ValueError:
+            continue
+        if not isinstance(value, dict):
+            raise OutputParseError(stage, f"expected a JSON object, got {type(value).__name__}")
+        return value
+    raise OutputParseError(stage, "no valid JSON object found")
+
+
+def _as_text(value):
+    # Models sometimes nest an object or list where a sentence was asked for
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+# One frozen dataclass per feature prompt, with the string fields that prompt declares
+FEATURE_MODELS = {
+    name: make_dataclass(f"{name.capitalize()}Findings", [(key, str) for key in keys], frozen=True)
+    for name, keys in FEATURE_KEYS.items()
+}
+
+
+def build_findings(feature, data):
+    """Validate a decoded section against its feature model."""
+    model = FEATURE_MODELS[feature]
+    if not isinstance(data, dict):
+        raise OutputParseError(feature, "section is not a JSON object")
+    missing = [field.name for field in fields(model) if data.get(field.name) is None]
+    if missing:
+        raise OutputParseError(feature, f"missing keys {missing}")
+    return model(**{field.name: _as_text(data[field.name]) for field in fields(model)})
+
+
+def parse_feature_output(feature, text):
+    """Parse one Gemini feature reply into its typed findings."""
+    return build_findings(feature, extract_json(text, feature))
+
+
+_RATING_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+@dataclass(frozen=True)
+class FeatureRating:
+    rating: float
+    description: str
+
+
+@dataclass(frozen=True)
+class AssessmentRatings:
+    """The final rating schema requested from the Llama stage."""
+
+    jawline: FeatureRating
+    smile: FeatureRating
+    skin: FeatureRating
+    cheekbones: FeatureRating
+    eyeline: FeatureRating
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data, stage="ratings"):
+        if not isinstance(data, dict):
+            raise OutputParseError(stage, "ratings are not a JSON object")
+        ratings = {}
+        for field in fields(cls):
+            section = data.get(field.name)
+            if not isinstance(section, dict):
+                raise OutputParseError(stage, f"missing section '{field.name}'")
+            ratings[field.name] = FeatureRating(
+                rating=_coerce_rating(section.get("rating"), stage, field.name),
+                description=_as_text(section.get("description", "")),
+            )
+        return cls(**ratings)
+
+
+def _coerce_rating(value, stage, feature):
+    # Accept 7, 7.5, "7" and "7/10"; reject anything outside 0-10
+    if isinstance(value, bool) or value is None:
+        raise OutputParseError(stage, f"'{feature}' has no numeric rating")
+    if isinstance(value, str):
+        match = _RATING_NUMBER.search(value)
+        if match is None:
+            raise OutputParseError(stage, f"'{feature}' rating {value!r} is not a number")
+        value = match.group()
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        raise OutputParseError(stage, f"'{feature}' rating {value!r} is not a number")
+    if not 0 <= rating <= 10:
+        raise OutputParseError(stage, f"'{feature}' rating {rating} is outside 0-10")
+    return rating
+
+
+def parse_ratings(text):
+    """Parse the Llama stage's reply into AssessmentRatings."""
+    return AssessmentRatings.from_dict(extract_json(text, "ratings"))
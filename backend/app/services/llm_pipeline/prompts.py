@@ -55,3 +55,83 @@ Critically describe the following conditions:
 4.  **Turgor and Hydration:** Assess the visible signs of skin turgor and hydration (e.g., fine dehydration lines).
 
 Avoid any subjective terms related to beauty, aesthetics, or attractiveness. Focus exclusively on clinical and pathological observations. Respond in JSON: {"pigmentation_and_chroma":"", "texture_and_surface_pathology":"", "inflammatory_and_vascular":""}"""
+
+# Llama aggregation prompt; filled with the five Gemini outputs via str.format
+RATING_PROMPT="""
+        Based on the Gemini analysis:
+
+        JAWLINE: {jawline}
+        SMILE: {smile}
+        SKIN: {skin}
+        CHEEKBONES: {cheekbone}
+        EYELINE: {eyeline}
+
+        Analyze each feature compared to professional model standards and provide a rating out of 10.
+        Return the response in this exact JSON format:
+
+        {{
+            "jawline": {{
+                "rating": <number>,
+                "description": "<detailed explanation>"
+            }},
+            "smile": {{
+                "rating": <number>,
+                "description": "<detailed explanation>"
+            }},
+            "skin": {{
+                "rating": <number>,
+                "description": "<detailed explanation>"
+            }},
+            "cheekbones": {{
+                "rating": <number>,
+                "description": "<detailed explanation>"
+            }},
+            "eyeline": {{
+                "rating": <number>,
+                "description": "<detailed explanation>"
+            }}
+        }}
+
+        Be brutally honest in your ratings and descriptions. Only return the JSON, no other text.
+        """
+
+# Keys each feature prompt asks the model to return, in prompt order
+FEATURE_KEYS = {
+    'jawline': ("mandible_structure", "menton_projection", "soft_tissue_obscurity"),
+    'smile': ("dental_alignment", "gingival_and_corridor", "smile_dynamics"),
+    'skin': ("pigmentation_and_chroma", "texture_and_surface_pathology", "inflammatory_and_vascular"),
+    'cheekbone': ("zygomatic_projection", "malar_support_adequacy", "midface_asymmetry"),
+    'eyeline': ("ocular_alignment", "periorbital_deficiencies", "eyelid_integrity"),
+}
+
+# Single-call variant: all five analyses over one upload of the images
+_FUSED_SECTIONS = (
+    ('jawline', JAWLINE_PROMPT),
+    ('smile', SMILE_PROMPT),
+    ('skin', SKIN_PROMPT),
+    ('cheekbone', CHEEKBONE_PROMPT),
+    ('eyeline', EYELINE_PROMPT),
+)
+
+FUSED_PROMPT = (
+    "Perform the five independent analyses below on the same set of images. "
+    "Follow each section's instructions exactly, and place that section's JSON answer under its key. "
+    "Respond with a single JSON object with exactly these top-level keys: "
+    + ", ".join(f'"{name}"' for name, _ in _FUSED_SECTIONS)
+    + ". Only return the JSON, no other text.\n\n"
+    + "\n\n".join(f"### SECTION \"{name}\"\n{prompt}" for name, prompt in _FUSED_SECTIONS)
+)
+
+# JSON schema for the fused response, for providers that support structured output
+FUSED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        name: {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in keys},
+            "required": list(keys),
+        }
+        for name, keys in FEATURE_KEYS.items()
+    },
+    "required": list(FEATURE_KEYS),
+}
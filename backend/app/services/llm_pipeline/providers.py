@@ -0,0 +1,136 @@
+import os
+import threading
+
+GEMINI_MODEL = "gemini-2.5-flash"
+LLAMA_MODEL = "meta-llama/Llama-4-Scout-17B-16E-Instruct:groq"
+LLAMA_BASE_URL = "https://router.huggingface.co/v1"
+
+
+class ProviderRegistry:
+    """
+    Long-lived model clients shared by every stage in the process.
+
+    Clients are created on first use and then reused, so their HTTP
+    connection pools (and TLS sessions) survive across assessments instead
+    of being rebuilt per call. The Llama clients get an explicit httpx pool
+    with keep-alive; the Gemini client manages its own transport and is
+    cached per model name. `api_key` is the Llama clients' key for the HF
+    router (default: HF_TOKEN), e.g. a placeholder for a local stand-in.
+    """
+
+    def __init__(self, timeout=None, max_retries=None, max_connections=None,
+                 max_keepalive_connections=None, keepalive_expiry=None, llama_base_url=None, api_key=None):
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT", 60))
+        # Retries live in the ProviderGuard (rate_limit.py); SDK-level retries would multiply them
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", 0))
+        self.max_connections = max_connections if max_connections is not None else int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+        self.max_keepalive_connections = (max_keepalive_connections if max_keepalive_connections is not None
+                                          else self.max_connections)
+        self.keepalive_expiry = keepalive_expiry if keepalive_expiry is not None else 60.0
+        self.llama_base_url = llama_base_url or os.getenv("HF_ROUTER_BASE_URL", LLAMA_BASE_URL)
+        self.api_key = api_key
+
+        self._gemini = {}
+        self._llama = None
+        self._llama_async = None
+        self._lock = threading.Lock()
+        self._env_loaded = False
+
+    def _load_env(self):
+        if not self._env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            self._env_loaded = True
+
+    def _httpx_limits(self):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def gemini(self, model=GEMINI_MODEL):
+        with self._lock:
+            client = self._gemini.get(model)
+            if client is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                self._load_env()
+                client = self._gemini[model] = ChatGoogleGenerativeAI(
+                    model=model,
+                    api_key=os.getenv("GEMINI_API_KEY"),
+                    temperature=0.3,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                )
+            return client
+
+    def llama(self):
+        """Synchronous OpenAI-compatible client for the HF router."""
+        with self._lock:
+            if self._llama is None:
+                import httpx
+                from openai import OpenAI
+
+                self._load_env()
+                self._llama = OpenAI(
+                    base_url=self.llama_base_url,
+                    api_key=self.api_key or os.getenv("HF_TOKEN"),
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=httpx.Client(limits=self._httpx_limits(), timeout=self.timeout),
+                )
+            return self._llama
+
+    def llama_async(self):
+        """Async OpenAI-compatible client for the HF router."""
+        with self._lock:
+            if self._llama_async is None:
+                import httpx
+                from openai import AsyncOpenAI
+
+                self._load_env()
+                self._llama_async = AsyncOpenAI(
+                    base_url=self.llama_base_url,
+                    api_key=self.api_key or os.getenv("HF_TOKEN"),
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=httpx.AsyncClient(limits=self._httpx_limits(), timeout=self.timeout),
+                )
+            return self._llama_async
+
+    def close(self):
+        """Close the sync pools. The async client should be closed with aclose()."""
+        with self._lock:
+            if self._llama is not None:
+                self._llama.close()
+                self._llama = None
+            self._gemini.clear()
+
+    async def aclose(self):
+        client, self._llama_async = self._llama_async, None
+        if client is not None:
+            await client.close()
+        self.close()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """The process-wide ProviderRegistry, created on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderRegistry()
+    return _registry
+
+
+def set_registry(registry):
+    """Replace the process-wide registry (e.g. to point at a local stand-in server)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
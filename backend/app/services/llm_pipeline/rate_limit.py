@@ -0,0 +1,335 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+
+    Refills at `rate` tokens per second and banks at most `capacity` tokens,
+    so short bursts up to `capacity` go through immediately. Waiters are
+    served in arrival order. A bucket can be shared by several event loops
+    in turn (each asyncio.run() starts a new one); waiters are ordered per loop.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._locks = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+
+    def _lock(self):
+        # An asyncio.Lock binds to the first loop that waits on it, so keep one per loop
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        async with self._lock():
+            self._refill()
+            if self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    Token bucket whose rate follows the provider's quota (AIMD).
+
+    With `rate=None` requests are not throttled until the first quota error.
+    Every throttled() call (a 429) cuts the rate by `decrease`, at most once
+    per `cooldown` seconds so a burst of 429s from requests already in flight
+    counts once, and pauses every waiter until Retry-After has passed. Each
+    success adds `increase` requests/second per second of successes, up to
+    `max_rate`, so throughput climbs back once the quota allows it.
+    """
+
+    def __init__(self, rate=None, min_rate=0.5, max_rate=None, decrease=0.5, increase=0.5, cooldown=1.0):
+        self.rate = None
+        self.capacity = 1
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decrease = decrease
+        self.increase = increase
+        self.cooldown = cooldown
+        self._tokens = 1
+        self._updated = time.monotonic()
+        self._locks = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._recent = deque()
+        if rate is not None:
+            self.set_rate(rate)
+
+    def set_rate(self, rate):
+        if self.rate is not None:
+            self._refill()
+        if self.max_rate is not None:
+            rate = min(rate, self.max_rate)
+        self.rate = max(self.min_rate, rate)
+        self.capacity = max(1, self.rate)
+        self._tokens = min(self._tokens, self.capacity)
+
+    def observed_rate(self):
+        """Requests/second admitted over the last second."""
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - 1.0:
+            self._recent.popleft()
+        return len(self._recent)
+
+    def throttled(self, retry_after=None):
+        now = time.monotonic()
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        current = self.rate if self.rate is not None else max(self.min_rate, self.observed_rate())
+        self.set_rate(current * self.decrease)
+
+    def succeeded(self):
+        if self.rate is not None and (self.max_rate is None or self.rate < self.max_rate):
+            self.set_rate(self.rate + self.increase / self.rate)
+
+    async def acquire(self, tokens=1):
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        if self.rate is not None:
+            await super().acquire(tokens)
+        self._recent.append(time.monotonic())
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. After `reset_timeout` seconds a
+    single probe call is let through: success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        if self.state == "closed":
+            return
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(f"circuit open after {self.failures} consecutive failures")
+
+    def release_probe(self):
+        """The probe ended without an answer (e.g. cancelled); let the next call probe instead."""
+        self._probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter; a Retry-After is always waited out."""
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def parse_retry_after(headers):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime  # rare path; keep it out of import time
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def classify_error(error):
+    """
+    (HTTP status or None, Retry-After seconds or None, retryable) for an
+    exception from any provider SDK. Reads the status from `status_code`
+    (OpenAI, httpx), an integer `code` (Google) or the attached response;
+    timeouts and connection errors without a status are retryable.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status is None:
+        code = getattr(error, "code", None)
+        status = code if isinstance(code, int) else None
+    retry_after = parse_retry_after(getattr(response, "headers", None))
+    if status is not None:
+        return int(status), retry_after, int(status) in RETRYABLE_STATUS
+    name = type(error).__name__
+    transient = isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+    return None, None, transient
+
+
+_guard_attempt = contextvars.ContextVar("provider_guard_attempt", default=0)
+
+
+def guard_attempt():
+    """
+    Which attempt of the enclosing ProviderGuard.call is running (0 for the
+    first), so spans opened inside make_call() can tell a retried request.
+    """
+    return _guard_attempt.get()
+
+
+class ProviderGuard:
+    """
+    Rate limit, retry and circuit breaker around one provider/model's calls.
+
+    call() takes a zero-argument function returning an awaitable (a fresh one
+    per attempt). Quota errors slow the limiter down and are retried after
+    Retry-After; server errors and timeouts are retried with backoff and
+    count towards the breaker; anything else is raised immediately.
+    """
+
+    def __init__(self, name, limiter=None, breaker=None, policy=None):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.policy = policy or RetryPolicy()
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0}
+
+    async def call(self, make_call):
+        for attempt in range(self.policy.max_attempts):
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self.stats["rejected"] += 1
+                raise
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            self.stats["calls"] += 1
+            token = _guard_attempt.set(attempt)
+            try:
+                result = await make_call()
+            except Exception as e:
+                status, retry_after, retryable = classify_error(e)
+                if status == 429:
+                    self.stats["throttled"] += 1
+                    if hasattr(self.limiter, "throttled"):
+                        self.limiter.throttled(retry_after)
+                    # Throttling means the provider is up; release a half-open probe
+                    self.breaker.record_success()
+                elif retryable:
+                    self.stats["failures"] += 1
+                    self.breaker.record_failure()
+                else:
+                    # A rejected request is not an outage
+                    self.breaker.record_success()
+                if not retryable or attempt == self.policy.max_attempts - 1:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.policy.backoff(attempt, retry_after))
+                continue
+            except BaseException:
+                # Cancelled (a losing hedge, a consumer that stopped early): not
+                # an outcome for the breaker, but a half-open probe must be freed
+                self.breaker.release_probe()
+                raise
+            finally:
+                _guard_attempt.reset(token)
+            self.breaker.record_success()
+            if hasattr(self.limiter, "succeeded"):
+                self.limiter.succeeded()
+            return result
+
+
+def guarded_call(guard, make_call):
+    """Await make_call() through `guard`, or directly when there is none."""
+    if guard is None:
+        return make_call()
+    return guard.call(make_call)
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(provider, model):
+    """
+    The process-wide guard for one provider/model, so every analyzer shares
+    its quota. `{PROVIDER}_RPS` (e.g. GEMINI_RPS, LLAMA_RPS) caps the rate;
+    unset means unthrottled until the provider first returns 429.
+    LLM_RETRY_ATTEMPTS, LLM_BREAKER_THRESHOLD and LLM_BREAKER_RESET tune the
+    retry policy and breaker.
+    """
+    key = (provider, model)
+    with _guards_lock:
+        guard = _guards.get(key)
+        if guard is None:
+            guard = _guards[key] = _build_guard(provider, model)
+    return guard
+
+
+def _build_guard(provider, model):
+    max_rate = os.getenv(f"{provider.upper()}_RPS")
+    max_rate = float(max_rate) if max_rate else None
+    return ProviderGuard(
+        f"{provider}:{model}",
+        limiter=AdaptiveTokenBucket(rate=max_rate, max_rate=max_rate),
+        breaker=CircuitBreaker(int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+                               float(os.getenv("LLM_BREAKER_RESET", 30))),
+        policy=RetryPolicy(max_attempts=int(os.getenv("LLM_RETRY_ATTEMPTS", 4))),
+    )
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from backend.app.services.llm_pipeline.prompts import (JAWLINE_PROMPT,SMILE_PROMPT,SKIN_PROMPT,CHEEKBONE_PROMPT,EYELINE_PROMPT,
+                                                       FEATURE_KEYS,FUSED_PROMPT)
+
+_PROMPT_FEATURES = {
+    JAWLINE_PROMPT: 'jawline',
+    SMILE_PROMPT: 'smile',
+    SKIN_PROMPT: 'skin',
+    CHEEKBONE_PROMPT: 'cheekbone',
+    EYELINE_PROMPT: 'eyeline',
+}
+
+
+def schema_reply(messages):
+    """A schema-valid JSON reply for whichever feature (or fused) prompt was sent."""
+    content = messages[0]["content"]
+    prompt = content if isinstance(content, str) else content[0].get("text", "")
+    if prompt == FUSED_PROMPT:
+        return json.dumps({name: {key: "stub finding" for key in keys} for name, keys in FEATURE_KEYS.items()})
+    feature = _PROMPT_FEATURES.get(prompt)
+    if feature is None:
+        return json.dumps({"stub": "ok"})
+    return json.dumps({key: "stub finding" for key in FEATURE_KEYS[feature]})
+
+
+class StubMessage:
+    """Minimal stand-in for a LangChain AIMessage."""
+
+    def __init__(self, content):
+        self.content = content
+
+
+class StubChatModel:
+    """
+    Offline stand-in for ChatGoogleGenerativeAI.
+
+    Sleeps for a fixed latency and returns a canned JSON reply, so pipeline
+    code can be exercised and benchmarked without network access or API keys.
+    Without an explicit `reply`, answers each feature prompt with JSON that
+    matches that prompt's schema.
+    """
+
+    def __init__(self, latency=0.5, reply=None, model="stub-model"):
+        self.latency = latency
+        self.reply = reply
+        self.model = model
+        self.calls = 0
+
+    def _reply(self, messages):
+        return self.reply if self.reply is not None else schema_reply(messages)
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubMessage(self._reply(messages))
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return StubMessage(self._reply(messages))
+
+
+class _StubCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model, messages, **kwargs):
+        owner = self._owner
+        owner.calls += 1
+        time.sleep(owner.latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=StubMessage(owner.reply))])
+
+
+class StubOpenAIClient:
+    """
+    Offline stand-in for the OpenAI client used by the Llama stage; exposes
+    only `chat.completions.create`.
+    """
+
+    def __init__(self, latency=0.5, reply=None):
+        self.latency = latency
+        self.reply = reply if reply is not None else json.dumps(
+            {feature: {"rating": 5, "description": "stub"}
+             for feature in ("jawline", "smile", "skin", "cheekbones", "eyeline")}
+        )
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_StubCompletions(self))
+
+
+class _StubAsyncCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        owner = self._owner
+        owner.calls += 1
+        if not stream:
+            await asyncio.sleep(owner.latency)
+            return SimpleNamespace(choices=[SimpleNamespace(message=StubMessage(owner.reply))])
+        return self._stream(owner)
+
+    async def _stream(self, owner):
+        # Spread the latency over the tokens so the first chunk arrives early
+        tokens = [owner.reply[i:i + owner.chunk_size] for i in range(0, len(owner.reply), owner.chunk_size)]
+        for token in tokens:
+            await asyncio.sleep(owner.latency / max(1, len(tokens)))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+
+class StubAsyncOpenAIClient(StubOpenAIClient):
+    """Async variant of StubOpenAIClient; supports `stream=True`."""
+
+    def __init__(self, latency=0.5, reply=None, chunk_size=4):
+        super().__init__(latency, reply)
+        self.chunk_size = chunk_size
+        self.chat = SimpleNamespace(completions=_StubAsyncCompletions(self))
@@ -0,0 +1,58 @@
+# Rough token accounting for request payloads. Providers tokenize differently,
+# so these are estimates for comparing modes, not billing figures.
+
+# Gemini bills a small image at a flat 258 tokens (larger ones per 768px tile)
+IMAGE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+
+
+def estimate_text_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(messages):
+    """Estimated input tokens for a list of chat messages with text and image parts."""
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            total += estimate_text_tokens(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                total += estimate_text_tokens(part["text"])
+            elif part.get("type") == "image_url":
+                total += IMAGE_TOKENS
+    return total
+
+
+def message_bytes(messages):
+    """Approximate request body size: text parts as UTF-8 plus image data URLs."""
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            total += len(content.encode("utf-8"))
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                total += len(part["text"].encode("utf-8"))
+            elif part.get("type") == "image_url":
+                url = part["image_url"]
+                total += len(url["url"] if isinstance(url, dict) else url)
+    return total
+
+
+def reported_usage(response):
+    """
+    (input tokens, output tokens) as reported by the provider, or None.
+
+    Reads LangChain's `usage_metadata` and the OpenAI client's `usage`.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict) and "input_tokens" in usage:
+        return usage["input_tokens"], usage.get("output_tokens", 0)
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, getattr(usage, "completion_tokens", 0) or 0
+    return None
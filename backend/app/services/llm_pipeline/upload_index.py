@@ -0,0 +1,144 @@
+import bisect
+import heapq
+import os
+import threading
+from collections import OrderedDict
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+
+
+def is_image_name(name):
+    # Same matching as the '*.jpg' / '*.jpeg' / '*.png' globs: case-sensitive, no dotfiles
+    return not name.startswith('.') and name.endswith(IMAGE_SUFFIXES)
+
+
+def scan_images(folder_path):
+    """Yield (mtime_ns, path) for every image in the folder in one os.scandir pass."""
+    try:
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if is_image_name(entry.name) and entry.is_file():
+                    yield entry.stat().st_mtime_ns, entry.path
+    except FileNotFoundError:
+        return
+
+
+def most_recent_images(folder_path, count=3):
+    """One-shot lookup of the `count` newest images, newest first, in O(n log count)."""
+    return [path for _, path in heapq.nlargest(count, scan_images(folder_path))]
+
+
+class UploadIndex:
+    """
+    Incrementally maintained (mtime, path) index over one upload folder.
+
+    The folder is scanned once; afterwards uploads registered through add()
+    are inserted in O(log n) (O(1) for the usual newest-file case) and
+    recent(N) is an O(N) slice. Files written by other processes are picked
+    up because a change in the folder's own mtime triggers a rescan.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self._entries = []   # sorted ascending by (mtime_ns, path)
+        self._mtimes = {}    # path -> mtime_ns
+        self._folder_mtime_ns = None
+        self._lock = threading.Lock()
+
+    def _folder_mtime(self):
+        try:
+            return os.stat(self.folder_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Rebuild the index from a single scan of the folder."""
+        with self._lock:
+            self._rescan()
+
+    def _rescan(self):
+        folder_mtime = self._folder_mtime()
+        entries = sorted(scan_images(self.folder_path))
+        self._entries = entries
+        self._mtimes = {path: mtime for mtime, path in entries}
+        self._folder_mtime_ns = folder_mtime
+
+    def _ensure_current(self):
+        folder_mtime = self._folder_mtime()
+        if self._folder_mtime_ns is None or folder_mtime != self._folder_mtime_ns:
+            self._rescan()
+
+    def add(self, path, mtime_ns=None, folder_mtime_ns=None):
+        """
+        Register a new or rewritten upload without rescanning the folder.
+
+        `folder_mtime_ns` is the folder's mtime from before the caller wrote
+        the file. If it matches the index, the folder mtime change the write
+        caused is absorbed; if not, something else changed the folder too
+        and it is rescanned. Without it the caller's write is assumed to be
+        the only change.
+        """
+        if mtime_ns is None:
+            mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            if self._folder_mtime_ns is None or (
+                    folder_mtime_ns is not None and folder_mtime_ns != self._folder_mtime_ns):
+                self._rescan()
+                return
+            self._discard(path)
+            item = (mtime_ns, path)
+            if not self._entries or item > self._entries[-1]:
+                self._entries.append(item)
+            else:
+                bisect.insort(self._entries, item)
+            self._mtimes[path] = mtime_ns
+            # Our own write bumped the folder mtime; don't treat it as foreign
+            self._folder_mtime_ns = self._folder_mtime()
+
+    def remove(self, path):
+        with self._lock:
+            self._discard(path)
+            self._folder_mtime_ns = self._folder_mtime()
+
+    def _discard(self, path):
+        mtime = self._mtimes.pop(path, None)
+        if mtime is None:
+            return
+        position = bisect.bisect_left(self._entries, (mtime, path))
+        if position < len(self._entries) and self._entries[position] == (mtime, path):
+            del self._entries[position]
+
+    def recent(self, count=3):
+        """The `count` most recently modified images, newest first."""
+        with self._lock:
+            self._ensure_current()
+            if count <= 0:
+                return []
+            return [path for _, path in reversed(self._entries[-count:])]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Most recently used folders' indexes; one per user folder, so bound them
+MAX_INDEXES = int(os.getenv("UPLOAD_INDEX_LIMIT", 256))
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_upload_index(folder_path):
+    """
+    Process-wide UploadIndex for a folder, created on first use. At most
+    MAX_INDEXES are kept; the least recently used one is dropped and simply
+    rescans its folder if it is needed again.
+    """
+    key = os.path.abspath(folder_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = UploadIndex(key)
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+        return index
@@ -0,0 +1,52 @@
+"""
+Benchmark: batch runner throughput against stub models.
+
+Builds a synthetic manifest that points every job at the sample uploads and
+runs it through the batch worker pool in dry-run mode. From the repo root:
+
+    python -m backend.benchmarks.bench_batch_throughput --jobs 200 --workers 1 8 32
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+from backend.app.services.llm_pipeline.batch import load_manifest, run_batch
+from backend.app.services.llm_pipeline.facial_analysis import FacialAnalyzer
+from backend.app.services.llm_pipeline.image_helper import FACIAL_IMAGES_PATH, get_only_recent_images
+from backend.app.services.llm_pipeline.stub_llm import StubChatModel, StubOpenAIClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stub model call")
+    args = parser.parse_args()
+
+    images = get_only_recent_images(FACIAL_IMAGES_PATH)
+    with tempfile.TemporaryDirectory() as workdir:
+        manifest_path = os.path.join(workdir, "manifest.jsonl")
+        with open(manifest_path, "w") as manifest:
+            for i in range(args.jobs):
+                manifest.write(json.dumps({"id": f"job-{i}", "images": images}) + "\n")
+
+        print(f"{args.jobs} jobs, stub latency {args.latency}s per call")
+        for workers in args.workers:
+            output_path = os.path.join(workdir, f"results-{workers}.jsonl")
+            analyzer = FacialAnalyzer(gemini_llm=StubChatModel(args.latency),
+                                      llama_client=StubOpenAIClient(args.latency))
+            # The pipeline prints per-call progress; keep the benchmark output readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = asyncio.run(run_batch(load_manifest(manifest_path), output_path, analyzer,
+                                              workers=workers, progress_every=0))
+            print(f"  workers={workers:<3}: {stats['seconds']:6.2f}s  {stats['throughput']:7.2f} assessments/s"
+                  f"  ({stats['error']} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: new TCP connections opened by the Llama stage.
+
+Starts a local HTTP/1.1 stand-in for the HF router's chat completions
+endpoint that counts accepted connections, then runs the Llama stage N times
+with a fresh OpenAI client per call (the old behaviour) and with the pooled
+client from the provider registry. From the repo root:
+
+    python -m backend.benchmarks.bench_connection_reuse --assessments 100
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.app.services.llm_pipeline.facial_analysis import process_with_llama
+from backend.app.services.llm_pipeline.feature_analysis import FEATURE_PROMPTS
+from backend.app.services.llm_pipeline.image_helper import PreparedImage
+from backend.app.services.llm_pipeline.providers import LLAMA_MODEL, ProviderRegistry, set_registry
+
+COMPLETION = json.dumps({
+    "id": "stub", "object": "chat.completion", "created": 0, "model": LLAMA_MODEL,
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "{}"}}],
+}).encode("utf-8")
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, ChatCompletionsHandler)
+        self.connections = 0
+
+    def get_request(self):
+        request = super().get_request()
+        self.connections += 1
+        return request
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid Nagle delaying the body
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(label, server, assessments, client_factory):
+    images = [PreparedImage(f"fake_{i}.jpg", "image/jpeg", "AAAA") for i in range(3)]
+    outputs = {name: "{}" for name in FEATURE_PROMPTS}
+    before = server.connections
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(assessments):
+            process_with_llama(images, outputs, client_factory())
+    elapsed = time.perf_counter() - start
+    print(f"  {label:22s}: {server.connections - before:4d} new connections, {elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assessments", type=int, default=100)
+    args = parser.parse_args()
+
+    server = CountingServer(("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    from openai import OpenAI
+    registry = ProviderRegistry(llama_base_url=base_url, max_retries=0, api_key="stub")
+    set_registry(registry)
+
+    print(f"{args.assessments} Llama-stage calls against {base_url}")
+    run("client per call", server, args.assessments,
+        lambda: OpenAI(base_url=base_url, api_key="stub", max_retries=0))
+    run("pooled registry client", server, args.assessments, lambda: None)
+
+    registry.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
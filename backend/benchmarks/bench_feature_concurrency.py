@@ -0,0 +1,47 @@
+"""
+Benchmark: serial vs concurrent per-feature Gemini calls.
+
+Uses a fixed-latency stub model, so it runs offline. From the repo root:
+
+    python -m backend.benchmarks.bench_feature_concurrency --latency 0.5
+"""
+
+import argparse
+import time
+
+from backend.app.services.llm_pipeline.feature_analysis import (
+    FEATURE_PROMPTS, build_feature_message, analyze_features
+)
+from backend.app.services.llm_pipeline.image_helper import PreparedImage
+from backend.app.services.llm_pipeline.stub_llm import StubChatModel
+
+FAKE_IMAGES = [PreparedImage(f"fake_{i}.jpg", "image/jpeg", "AAAA") for i in range(3)]
+
+
+def run_serial(llm):
+    return {name: llm.invoke(build_feature_message(prompt, FAKE_IMAGES)).content
+            for name, prompt in FEATURE_PROMPTS.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per fake model call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 5])
+    args = parser.parse_args()
+
+    llm = StubChatModel(latency=args.latency)
+
+    start = time.perf_counter()
+    run_serial(llm)
+    serial = time.perf_counter() - start
+    print(f"serial        : {serial:6.3f}s")
+
+    for limit in args.concurrency:
+        start = time.perf_counter()
+        analyze_features(llm, FAKE_IMAGES, max_concurrency=limit)
+        elapsed = time.perf_counter() - start
+        print(f"concurrency={limit:<2}: {elapsed:6.3f}s  ({serial / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
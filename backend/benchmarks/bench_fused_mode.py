@@ -0,0 +1,84 @@
+"""
+Benchmark: fused single-call Gemini mode vs five per-feature calls.
+
+Uses a stub model that answers with schema-valid JSON, estimates input
+tokens per request, and charges latency per request plus per input token.
+--broken N corrupts N sections of the fused reply to exercise the
+per-section fallback. From the repo root:
+
+    python -m backend.benchmarks.bench_fused_mode --broken 0 1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+from backend.app.services.llm_pipeline.feature_analysis import (
+    FEATURE_PROMPTS, analyze_features_async, analyze_features_fused_async
+)
+from backend.app.services.llm_pipeline.image_helper import PreparedImage
+from backend.app.services.llm_pipeline.prompts import FEATURE_KEYS, FUSED_PROMPT
+from backend.app.services.llm_pipeline.stub_llm import StubMessage
+from backend.app.services.llm_pipeline.tokens import estimate_message_tokens
+
+FAKE_IMAGES = [PreparedImage(f"fake_{i}.jpg", "image/jpeg", "AAAA") for i in range(3)]
+PROMPT_FEATURES = {prompt: name for name, prompt in FEATURE_PROMPTS.items()}
+
+
+class SchemaStubModel:
+    def __init__(self, base_latency, seconds_per_token, broken=0):
+        self.base_latency = base_latency
+        self.seconds_per_token = seconds_per_token
+        self.broken = broken
+        self.requests = 0
+        self.input_tokens = 0
+
+    async def ainvoke(self, messages):
+        tokens = estimate_message_tokens(messages)
+        self.requests += 1
+        self.input_tokens += tokens
+        await asyncio.sleep(self.base_latency + tokens * self.seconds_per_token)
+
+        prompt = messages[0]["content"][0]["text"]
+        if prompt == FUSED_PROMPT:
+            reply = {name: {key: "stub finding" for key in keys} for name, keys in FEATURE_KEYS.items()}
+            for name in list(FEATURE_KEYS)[:self.broken]:
+                reply[name] = {"unexpected": 1}
+        else:
+            reply = {key: "stub finding" for key in FEATURE_KEYS[PROMPT_FEATURES[prompt]]}
+        return StubMessage(json.dumps(reply))
+
+
+async def measure(label, analyze, model):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outputs = await analyze(model, FAKE_IMAGES)
+    elapsed = time.perf_counter() - start
+    assert list(outputs) == list(FEATURE_PROMPTS)
+    print(f"  {label:22s}: {model.requests} requests, ~{model.input_tokens:6d} input tokens, {elapsed:6.3f}s")
+    return model.input_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed seconds per request")
+    parser.add_argument("--per-token", type=float, default=0.0001, help="Extra seconds per input token")
+    parser.add_argument("--broken", type=int, nargs="+", default=[0, 1])
+    args = parser.parse_args()
+
+    async def run():
+        baseline = await measure("per-feature (5 calls)", analyze_features_async,
+                                 SchemaStubModel(args.latency, args.per_token))
+        for broken in args.broken:
+            fused = await measure(f"fused, {broken} bad section(s)", analyze_features_fused_async,
+                                  SchemaStubModel(args.latency, args.per_token, broken))
+            print(f"    input token reduction: {baseline / fused:4.1f}x")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
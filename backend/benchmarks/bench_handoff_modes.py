@@ -0,0 +1,74 @@
+"""
+Benchmark: Gemini-to-Llama handoff modes.
+
+Runs one assessment per handoff mode against stub models over the sample
+uploads and prints the estimated tokens per stage. The Llama stub charges
+latency per input token, so the rating-stage latency tracks payload size.
+From the repo root:
+
+    python -m backend.benchmarks.bench_handoff_modes
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from backend.app.services.llm_pipeline.facial_analysis import HANDOFF_MODES, FacialAnalyzer
+from backend.app.services.llm_pipeline.feature_analysis import FEATURE_PROMPTS
+from backend.app.services.llm_pipeline.image_helper import FACIAL_IMAGES_PATH, get_only_recent_images
+from backend.app.services.llm_pipeline.prompts import FEATURE_KEYS
+from backend.app.services.llm_pipeline.stub_llm import StubChatModel, StubMessage, StubOpenAIClient
+from backend.app.services.llm_pipeline.tokens import estimate_message_tokens
+
+# Real Gemini replies are verbose: prose around the JSON and long findings
+VERBOSE_FINDING = "Moderate definition with mild asymmetry noted on the left side; " * 6
+PROMPT_FEATURES = {prompt: name for name, prompt in FEATURE_PROMPTS.items()}
+
+
+class VerboseGemini(StubChatModel):
+    async def ainvoke(self, messages):
+        feature = PROMPT_FEATURES[messages[0]["content"][0]["text"]]
+        body = json.dumps({key: VERBOSE_FINDING for key in FEATURE_KEYS[feature]}, indent=2)
+        return StubMessage(f"Here is the structured analysis you asked for:\n```json\n{body}\n```")
+
+
+class TokenPricedLlama(StubOpenAIClient):
+    def __init__(self, seconds_per_token):
+        super().__init__(latency=0)
+        self.seconds_per_token = seconds_per_token
+        create = self.chat.completions.create
+
+        def priced_create(model, messages, **kwargs):
+            time.sleep(estimate_message_tokens(messages) * self.seconds_per_token)
+            return create(model=model, messages=messages, **kwargs)
+
+        self.chat.completions.create = priced_create
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--per-token", type=float, default=0.0002, help="Llama stub seconds per input token")
+    args = parser.parse_args()
+
+    paths = get_only_recent_images(FACIAL_IMAGES_PATH)
+    for mode in HANDOFF_MODES:
+        analyzer = FacialAnalyzer(gemini_llm=VerboseGemini(latency=0), llama_client=TokenPricedLlama(args.per_token),
+                                  handoff=mode)
+        usage = {}
+        log_usage = analyzer.log_usage
+
+        def capture(*log_args):
+            usage.update(log_usage(*log_args), seconds=log_args[3])
+            return usage
+
+        analyzer.log_usage = capture
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer.analyze(paths)
+        print(f"  {mode:14s}: gemini_in~{usage['gemini_input_tokens']:6d}  gemini_out~{usage['gemini_output_tokens']:5d}"
+              f"  llama_in~{usage['llama_input_tokens']:5d}  rating stage {usage['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: hedged Gemini feature calls against a long-tailed stub.
+
+The stub answers most calls in about `--fast` seconds, but a `--tail-rate`
+fraction takes `--slow` seconds, like the occasional stalled provider call.
+An assessment waits for all five features, so one slow call sets its
+latency. Runs the feature stage N times without hedging, with hedging to a
+duplicate on the same route, and with hedging to a fallback model, and
+prints latency percentiles and the extra calls sent.
+
+p99 is the headline: with the default 1% tail about 5% of assessments
+stall, so the unhedged p99 is `--slow`, and hedging should bring it back
+near the fast path. Above a 2% tail, over 1% of hedged assessments still
+stall (both copies slow) and p99 hides the gain; compare the stalled share
+instead. From the repo root:
+
+    python -m backend.benchmarks.bench_hedged_requests --assessments 1000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from backend.app.services.llm_pipeline.feature_analysis import analyze_features_async
+from backend.app.services.llm_pipeline.hedging import HedgeRoute, Hedger
+from backend.app.services.llm_pipeline.image_helper import FACIAL_IMAGES_PATH, get_only_recent_images, prepare_images
+from backend.app.services.llm_pipeline.stub_llm import StubChatModel, StubMessage
+
+
+class LongTailModel(StubChatModel):
+    def __init__(self, fast, slow, tail_rate, model, seed):
+        super().__init__(latency=fast, model=model)
+        self.slow = slow
+        self.tail_rate = tail_rate
+        self.random = random.Random(seed)
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        slow = self.random.random() < self.tail_rate
+        await asyncio.sleep(self.slow if slow else self.latency * self.random.uniform(0.8, 1.2))
+        return StubMessage(self._reply(messages))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(label, assessments, images, primary, hedger=None, fallback=None, slow_cutoff=0.2):
+    latencies = []
+    for _ in range(assessments):
+        started = time.perf_counter()
+        await analyze_features_async(primary, images, hedger=hedger)
+        latencies.append(time.perf_counter() - started)
+    calls = primary.calls + (fallback.calls if fallback is not None else 0)
+    extra = calls / (assessments * 5) - 1
+    stalled = sum(latency > slow_cutoff for latency in latencies) / assessments
+    print(f"  {label:18s}: p50 {percentile(latencies, 0.5):.3f}s  p90 {percentile(latencies, 0.9):.3f}s  "
+          f"p99 {percentile(latencies, 0.99):.3f}s  stalled {stalled:5.1%}  extra calls {extra:5.1%}")
+
+
+async def main_async(args):
+    images = prepare_images(get_only_recent_images(FACIAL_IMAGES_PATH))
+
+    def model(name, seed):
+        return LongTailModel(args.fast, args.slow, args.tail_rate, name, seed)
+
+    cutoff = args.slow / 2
+    print(f"{args.assessments} assessments x 5 feature calls; {args.tail_rate:.0%} of calls take {args.slow}s "
+          f"instead of ~{args.fast}s ('stalled' = over {cutoff}s)")
+    await run("no hedging", args.assessments, images, model("primary-a", 1), slow_cutoff=cutoff)
+
+    primary = model("primary-b", 1)
+    hedger = Hedger(HedgeRoute("bench:primary-b", lambda: primary), quantile=args.quantile)
+    await run("hedge to duplicate", args.assessments, images, primary, hedger, slow_cutoff=cutoff)
+
+    primary, fallback = model("primary-c", 1), model("fallback-c", 2)
+    hedger = Hedger(HedgeRoute("bench:primary-c", lambda: primary), HedgeRoute("bench:fallback-c", lambda: fallback),
+                    quantile=args.quantile)
+    await run("hedge to fallback", args.assessments, images, primary, hedger, fallback, slow_cutoff=cutoff)
+    print(f"    hedges sent {hedger.stats['hedged']}, won {hedger.stats['hedge_won']} "
+          f"(threshold p{args.quantile * 100:.0f} = {hedger.hedge_delay():.3f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assessments", type=int, default=1000)
+    parser.add_argument("--fast", type=float, default=0.02, help="Typical seconds per call")
+    parser.add_argument("--slow", type=float, default=0.4, help="Seconds per tail call")
+    parser.add_argument("--tail-rate", type=float, default=0.01, help="Fraction of calls in the slow tail")
+    parser.add_argument("--quantile", type=float, default=0.9, help="Hedge after this latency quantile")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: allocations and file reads for one assessment's request payloads.
+
+Compares the legacy flow (encode for Gemini, rebuild the image parts for every
+feature prompt, then re-read and re-encode every file for Llama) against
+PreparedImage, where each file is read and encoded once and the content parts
+are shared. Model calls are replaced by building the messages, so this runs
+offline. From the repo root:
+
+    python -m backend.benchmarks.bench_image_payload_memory [image paths...]
+"""
+
+import argparse
+import base64
+import sys
+import tracemalloc
+
+from backend.app.services.llm_pipeline.facial_analysis import FACIAL_IMAGES_PATH, build_llama_content
+from backend.app.services.llm_pipeline.feature_analysis import FEATURE_PROMPTS, build_feature_message
+from backend.app.services.llm_pipeline.image_helper import (
+    get_only_recent_images, encode_image_files, prepare_images
+)
+
+FAKE_OUTPUTS = {name: '{"finding": "stub"}' for name in FEATURE_PROMPTS}
+
+
+def legacy_assessment(paths):
+    images = encode_image_files(paths)
+    messages = [
+        [{"role": "user", "content": [
+            {"type": "text", "text": prompt},
+            *[{"type": "image_url", "image_url": f"data:image/jpeg;base64,{img['inlineData']['data']}"} for img in images]
+        ]}]
+        for prompt in FEATURE_PROMPTS.values()
+    ]
+    llama_parts = []
+    for path in paths:
+        with open(path, "rb") as image_file:
+            encoded = base64.b64encode(image_file.read()).decode('utf-8')
+        llama_parts.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}"}})
+    return images, messages, llama_parts
+
+
+def prepared_assessment(paths):
+    images = prepare_images(paths)
+    messages = [build_feature_message(prompt, images) for prompt in FEATURE_PROMPTS.values()]
+    llama_content = build_llama_content(images, FAKE_OUTPUTS)
+    return images, messages, llama_content
+
+
+def measure(func, paths):
+    reads = []
+    watched = set(paths)
+
+    def hook(event, args):
+        if event == "open" and args and str(args[0]) in watched:
+            reads.append(args[0])
+
+    sys.addaudithook(hook)
+    tracemalloc.start()
+    result = func(paths)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Audit hooks cannot be removed; stop counting once this run is done
+    watched.clear()
+    del result
+    return current, peak, len(reads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="*", help="Image files (default: 3 most recent uploads)")
+    args = parser.parse_args()
+
+    paths = args.paths or get_only_recent_images(FACIAL_IMAGES_PATH)
+    if not paths:
+        sys.exit(f"No images found in {FACIAL_IMAGES_PATH}")
+
+    print(f"{len(paths)} images, {len(FEATURE_PROMPTS)} feature prompts + 1 Llama request")
+    for label, func in (("legacy", legacy_assessment), ("prepared", prepared_assessment)):
+        retained, peak, reads = measure(func, list(paths))
+        print(f"  {label:9s}: retained {retained / 1e6:7.2f} MB  peak {peak / 1e6:7.2f} MB  file reads {reads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: import cost of the facial analysis module.
+
+Imports the module in a fresh interpreter with an audit hook installed and
+reports the wall time plus any non-module file opens, directory scans of the
+uploads folder, or socket activity. From the repo root:
+
+    python -m backend.benchmarks.bench_import_time --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULE = "backend.app.services.llm_pipeline.facial_analysis"
+
+PROBE = r"""
+import json, sys, time
+
+events = []
+IGNORED_SUFFIXES = ('.py', '.pyc', '.pth', '.so')
+WATCHED = {'open', 'os.scandir', 'os.listdir', 'glob.glob', 'socket.connect', 'socket.getaddrinfo'}
+
+def hook(event, args):
+    if event not in WATCHED:
+        return
+    target = str(args[0]) if args else ''
+    if event == 'open' and (target.endswith(IGNORED_SUFFIXES) or not target):
+        return
+    if event in ('os.scandir', 'os.listdir') and 'uploads' not in target:
+        return
+    events.append([event, target])
+
+sys.addaudithook(hook)
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+heavy = [name for name in ('langchain_google_genai', 'openai', 'PIL') if name in sys.modules]
+print(json.dumps({'seconds': elapsed, 'io': events, 'heavy_modules': heavy}))
+"""
+
+
+def measure_once():
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, MODULE],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    times_ms = [sample["seconds"] * 1000 for sample in samples]
+
+    print(f"import {MODULE}")
+    print(f"  median : {statistics.median(times_ms):7.2f} ms")
+    print(f"  max    : {max(times_ms):7.2f} ms")
+
+    io_events = samples[0]["io"]
+    heavy = samples[0]["heavy_modules"]
+    print(f"  I/O during import   : {io_events or 'none'}")
+    print(f"  heavy SDKs imported : {heavy or 'none'}")
+
+    if io_events or heavy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark: Llama stage against a local server that enforces a quota.
+
+Starts an HTTP/1.1 stand-in for the HF router's chat completions endpoint
+that admits `--server-rps` requests per second and answers the rest with
+429 and a Retry-After header, then runs the Llama stage of N assessments
+with a fixed number in flight:
+
+    unguarded : one attempt per call, as before (quota errors fail the assessment)
+    guarded   : adaptive token bucket + jittered backoff + circuit breaker
+
+A final phase switches the server to returning 503 for everything and shows
+the breaker failing calls fast instead of hammering it. Two checks run
+first: a rate-limited guard shared by back-to-back synchronous analyze()
+calls (each runs its own event loop), and a half-open probe that is
+cancelled must not leave the breaker rejecting every call. From the repo root:
+
+    python -m backend.benchmarks.bench_rate_limit_backoff --assessments 150 --server-rps 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.app.services.llm_pipeline.facial_analysis import FacialAnalyzer
+from backend.app.services.llm_pipeline.feature_analysis import FEATURE_PROMPTS
+from backend.app.services.llm_pipeline.image_helper import PreparedImage
+from backend.app.services.llm_pipeline.providers import LLAMA_MODEL, ProviderRegistry, set_registry
+from backend.app.services.llm_pipeline.rate_limit import AdaptiveTokenBucket, CircuitBreaker, ProviderGuard, RetryPolicy
+from backend.app.services.llm_pipeline.stub_llm import StubChatModel, StubOpenAIClient
+
+COMPLETION = json.dumps({
+    "id": "stub", "object": "chat.completion", "created": 0, "model": LLAMA_MODEL,
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": StubOpenAIClient(latency=0).reply}}],
+}).encode("utf-8")
+RATE_LIMITED = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}).encode("utf-8")
+UNAVAILABLE = json.dumps({"error": {"message": "Service unavailable", "type": "server_error"}}).encode("utf-8")
+
+
+class QuotaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, rps, latency):
+        super().__init__(address, QuotaHandler)
+        self.rps = rps
+        self.latency = latency
+        self.outage = False
+        self.counts = {200: 0, 429: 0, 503: 0}
+        self._tokens = rps
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rps, self._tokens + (now - self._updated) * self.rps)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class QuotaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if server.outage:
+            status, body, headers = 503, UNAVAILABLE, {}
+        elif server.admit():
+            time.sleep(server.latency)
+            status, body, headers = 200, COMPLETION, {}
+        else:
+            status, body, headers = 429, RATE_LIMITED, {"Retry-After": "1"}
+        server.counts[status] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def run(label, server, guard, assessments, in_flight):
+    analyzer = FacialAnalyzer(llama_guard=guard)
+    images = [PreparedImage(f"fake_{i}.jpg", "image/jpeg", "AAAA") for i in range(3)]
+    outputs = {name: "{}" for name in FEATURE_PROMPTS}
+    semaphore = asyncio.Semaphore(in_flight)
+    before = dict(server.counts)
+    failures = {}
+
+    async def one():
+        async with semaphore:
+            try:
+                await analyzer._rate(images, outputs)
+            except Exception as e:
+                failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one() for _ in range(assessments)))
+    elapsed = time.perf_counter() - started
+    served = {status: server.counts[status] - before[status] for status in server.counts}
+    ok = assessments - sum(failures.values())
+    print(f"  {label:10s}: {ok:4d}/{assessments} ok in {elapsed:6.2f}s ({ok / elapsed:5.1f}/s)  "
+          f"server saw 200x{served[200]} 429x{served[429]} 503x{served[503]}  failed {failures or 0}")
+
+
+def check_back_to_back_analyze():
+    """A guard with a rate outlives each analyze()'s asyncio.run(), as the process-wide ones do."""
+    guard = ProviderGuard("gemini", limiter=AdaptiveTokenBucket(rate=50, max_rate=50))
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(folder, f"face_{i}.jpg"))
+            with open(paths[-1], "wb") as image:
+                image.write(b"\xff\xd8\xff\xe0 not really a jpeg %d" % i)
+        for _ in range(2):
+            analyzer = FacialAnalyzer(gemini_llm=StubChatModel(latency=0), llama_client=StubOpenAIClient(latency=0),
+                                      gemini_guard=guard)
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyzer.analyze(paths)
+    print("  check     : two back-to-back analyze() calls share a rate-limited guard")
+
+
+async def check_cancelled_probe():
+    """Cancelling a half-open probe (a losing hedge, a consumer that stopped) frees it for the next call."""
+    guard = ProviderGuard("probe", breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.0),
+                          policy=RetryPolicy(max_attempts=1))
+
+    async def unavailable():
+        raise ConnectionRefusedError("connection refused")
+
+    async def hang():
+        await asyncio.sleep(60)
+
+    async def answer():
+        return "ok"
+
+    with contextlib.suppress(ConnectionRefusedError):
+        await guard.call(unavailable)
+    assert guard.breaker.state == "open"
+    probe = asyncio.ensure_future(guard.call(hang))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await probe
+    assert await guard.call(answer) == "ok", "breaker still rejects calls after a cancelled probe"
+    print(f"  check     : cancelled half-open probe released (breaker {guard.breaker.state})")
+
+
+def build_guard(attempts):
+    return ProviderGuard("llama", limiter=AdaptiveTokenBucket(), breaker=CircuitBreaker(5, 30.0),
+                         policy=RetryPolicy(max_attempts=attempts, base_delay=0.25))
+
+
+async def main_async(args, server):
+    await check_cancelled_probe()
+    print(f"{args.assessments} Llama calls, {args.in_flight} in flight, server quota {args.server_rps} req/s")
+    await run("unguarded", server, ProviderGuard("llama", policy=RetryPolicy(max_attempts=1)),
+              args.assessments, args.in_flight)
+    await asyncio.sleep(1.5)  # let the server's quota refill between phases
+    await run("guarded", server, build_guard(args.attempts), args.assessments, args.in_flight)
+
+    server.outage = True
+    guard = build_guard(args.attempts)
+    started = time.perf_counter()
+    await run("outage", server, guard, args.assessments, args.in_flight)
+    print(f"    breaker {guard.breaker.state} after {guard.stats['failures']} failed calls; "
+          f"{guard.stats['rejected']} rejected without a request ({time.perf_counter() - started:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assessments", type=int, default=150)
+    parser.add_argument("--in-flight", type=int, default=16)
+    parser.add_argument("--server-rps", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="Server seconds per admitted request")
+    parser.add_argument("--attempts", type=int, default=10, help="Guarded attempts per call")
+    args = parser.parse_args()
+
+    server = QuotaServer(("127.0.0.1", 0), args.server_rps, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    check_back_to_back_analyze()
+    os.environ.setdefault("HF_TOKEN", "bench")
+    set_registry(ProviderRegistry(llama_base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0))
+    try:
+        asyncio.run(main_async(args, server))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Load test: the assessment service against stub models.
+
+Uploads three sample images for each synthetic user, then submits
+assessments with a fixed number of clients in flight and polls each job to
+completion. Reports throughput and end-to-end latency next to the stub
+model time an assessment cannot avoid, so the gap is the service overhead.
+
+By default the ASGI app runs in-process over httpx's ASGI transport. To go
+over real sockets, start the service with stub models and point --url at it:
+
+    LLM_STUB=1 STUB_LATENCY=0.2 uvicorn backend.main:app --port 8000
+    python -m backend.benchmarks.bench_service_load --url http://127.0.0.1:8000
+
+--cold N also times N one-shot subprocess runs, i.e. what shelling out to the
+pipeline per request costs. From the repo root:
+
+    python -m backend.benchmarks.bench_service_load --requests 200 --clients 32
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from backend.app.services.llm_pipeline.image_helper import FACIAL_IMAGES_PATH, get_only_recent_images
+
+COLD_RUN = """
+import contextlib, io
+from backend.app.services.llm_pipeline.facial_analysis import FacialAnalyzer
+from backend.app.services.llm_pipeline.stub_llm import StubChatModel, StubOpenAIClient
+with contextlib.redirect_stdout(io.StringIO()):
+    FacialAnalyzer(gemini_llm=StubChatModel({latency}), llama_client=StubOpenAIClient({latency})).analyze({paths!r})
+"""
+
+
+def build_app(latency, workers, uploads_root):
+    from backend.main import AssessmentService
+    from backend.app.services.llm_pipeline.facial_analysis import FacialAnalyzer
+    from backend.app.services.llm_pipeline.stub_llm import StubAsyncOpenAIClient, StubChatModel, StubOpenAIClient
+
+    analyzer = FacialAnalyzer(gemini_llm=StubChatModel(latency), llama_client=StubOpenAIClient(latency),
+                              llama_async_client=StubAsyncOpenAIClient(latency), uploads_root=uploads_root)
+    return AssessmentService(analyzer, workers=workers, max_pending=10000)
+
+
+async def upload_samples(client, users, samples):
+    for user in users:
+        for path in samples:
+            with open(path, "rb") as image:
+                content_type = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+                response = await client.put(f"/users/{user}/images", content=image.read(),
+                                            headers={"content-type": content_type})
+                response.raise_for_status()
+
+
+async def run_load(client, users, requests, clients, poll_interval):
+    latencies = []
+    failures = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(users[i % len(users)])
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            user = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.post("/assessments", json={"user_id": user})
+            response.raise_for_status()
+            job_id = response.json()["id"]
+            while True:
+                job = (await client.get(f"/assessments/{job_id}")).json()
+                if job["status"] in ("done", "failed"):
+                    break
+                await asyncio.sleep(poll_interval)
+            if job["status"] == "failed":
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return time.perf_counter() - started, latencies, failures
+
+
+async def main_async(args):
+    samples = get_only_recent_images(FACIAL_IMAGES_PATH)
+    users = [f"load-{i}" for i in range(args.users)]
+
+    with tempfile.TemporaryDirectory() as uploads_root:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=120,
+                                       limits=httpx.Limits(max_connections=args.clients))
+        else:
+            transport = httpx.ASGITransport(app=build_app(args.latency, args.workers, uploads_root))
+            client = httpx.AsyncClient(transport=transport, base_url="http://service", timeout=120)
+
+        async with client:
+            await upload_samples(client, users, samples)
+            elapsed, latencies, failures = await run_load(client, users, args.requests, args.clients,
+                                                          args.poll_interval)
+            metrics = (await client.get("/metrics")).text
+
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    # Features run concurrently, then the streamed rating call: two stub latencies per assessment
+    floor = 2 * args.latency
+    print(f"{args.requests} assessments, {args.clients} clients, stub latency {args.latency}s per call"
+          f"{' (' + args.url + ')' if args.url else ' (in-process ASGI)'}")
+    print(f"  throughput     : {args.requests / elapsed:7.2f} assessments/s  ({failures} failed)")
+    print(f"  latency p50    : {statistics.median(latencies):7.3f}s")
+    print(f"  latency p95    : {p95:7.3f}s")
+    print(f"  model floor    : {floor:7.3f}s per assessment")
+    stages = [line for line in metrics.splitlines() if line.startswith("llm_pipeline_stage_seconds_count")]
+    print(f"  stages recorded: {len(stages)}")
+
+
+def cold_runs(count, latency):
+    paths = get_only_recent_images(FACIAL_IMAGES_PATH)
+    code = COLD_RUN.format(latency=latency, paths=paths)
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=os.getcwd())
+        timings.append(time.perf_counter() - started)
+    print(f"one-shot subprocess per request ({count} runs): median {statistics.median(timings):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Base URL of a running service (started with LLM_STUB=1)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="Assessments in flight from the load generator")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=32, help="Service workers (in-process mode only)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stub model call")
+    parser.add_argument("--poll-interval", type=float, default=0.02)
+    parser.add_argument("--cold", type=int, default=0, help="Also time this many one-shot subprocess runs")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+    if args.cold:
+        cold_runs(args.cold, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: "N most recent uploads" lookup on a large synthetic folder.
+
+Creates empty image files with distinct mtimes in a temporary folder, then
+compares the legacy three-glob + stat-per-file sort against a single scandir
+pass and the incrementally maintained UploadIndex. From the repo root:
+
+    python -m backend.benchmarks.bench_upload_index --files 100000
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from backend.app.services.llm_pipeline.upload_index import UploadIndex, most_recent_images
+
+
+def legacy_recent(folder_path, count):
+    all_files = []
+    for ext in ['*.jpg', '*.jpeg', '*.png']:
+        all_files.extend(glob.glob(os.path.join(folder_path, ext)))
+    all_files.sort(key=os.path.getmtime, reverse=True)
+    return all_files[:count]
+
+
+def populate(folder_path, files):
+    base = time.time() - files
+    suffixes = ('.jpg', '.jpeg', '.png')
+    for i in range(files):
+        path = os.path.join(folder_path, f"upload_{i:07d}{suffixes[i % 3]}")
+        with open(path, "wb"):
+            pass
+        os.utime(path, (base + i, base + i))
+
+
+def timed(label, func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:34s}: {best * 1000:10.3f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--count", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        print(f"Creating {args.files} files...")
+        populate(folder_path, args.files)
+        print(f"Most recent {args.count} of {args.files} files (best of 3):")
+
+        expected = timed("legacy glob + sort by getmtime", lambda: legacy_recent(folder_path, args.count))
+        single = timed("single scandir pass + nlargest", lambda: most_recent_images(folder_path, args.count))
+
+        index = UploadIndex(folder_path)
+        timed("UploadIndex initial build", index.refresh, repeat=1)
+        warm = timed("UploadIndex.recent (warm)", lambda: index.recent(args.count))
+
+        new_upload = os.path.join(folder_path, "upload_new.jpg")
+        with open(new_upload, "wb"):
+            pass
+        timed("UploadIndex.add new upload", lambda: index.add(new_upload), repeat=1)
+        latest = timed("UploadIndex.recent after add", lambda: index.recent(args.count))
+
+        assert single == expected == warm, "lookups disagree"
+        assert latest[0] == new_upload, "new upload not indexed"
+
+
+if __name__ == "__main__":
+    main()
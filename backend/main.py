@@ -0,0 +1,241 @@
+"""
+Long-lived assessment service.
+
+A dependency-free ASGI app over the facial analysis pipeline. The process
+stays up, so imports, model clients and their connection pools are paid for
+once at startup instead of on every request. Serve it with any ASGI server:
+
+    uvicorn backend.main:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+
+    PUT  /users/{user_id}/images        raw image body (image/jpeg or image/png); stores an upload
+    POST /assessments                   {"user_id": ..., "count": 3} -> 202 with the job
+    GET  /assessments/{job_id}          job status, and the ratings once done
+    GET  /assessments/{job_id}/events   server-sent events: features, rating deltas, final ratings
+    GET  /healthz                       queue stats
+    GET  /metrics                       per-stage Prometheus metrics
+
+Settings come from the environment: SERVICE_WORKERS (concurrent assessments,
+default 8), SERVICE_MAX_PENDING (queued assessments before 503, default 256),
+SERVICE_MAX_UPLOAD_BYTES (default 10 MB) and LLM_STUB=1 to answer with stub
+models (STUB_LATENCY seconds per call) for load testing.
+"""
+
+import asyncio
+import json
+import os
+import re
+
+from backend.app.services.llm_pipeline.facial_analysis import FacialAnalyzer
+from backend.app.services.llm_pipeline.image_helper import store_upload, user_upload_dir
+from backend.app.services.llm_pipeline.image_preprocess import ImagePreprocessor
+from backend.app.services.llm_pipeline.instrumentation import PrometheusSink, set_sink
+from backend.app.services.llm_pipeline.jobs import JobQueue, QueueFullError
+from backend.app.services.llm_pipeline.providers import get_registry
+
+UPLOAD_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png'}
+MAX_IMAGES = 10
+
+_USER_IMAGES = re.compile(r'^/users/([^/]+)/images$')
+_JOB = re.compile(r'^/assessments/([0-9a-f]{32})$')
+_JOB_EVENTS = re.compile(r'^/assessments/([0-9a-f]{32})/events$')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or []
+
+
+def build_analyzer():
+    if os.getenv("LLM_STUB", "0") == "1":
+        from backend.app.services.llm_pipeline.stub_llm import (StubAsyncOpenAIClient, StubChatModel,
+                                                                StubOpenAIClient)
+        latency = float(os.getenv("STUB_LATENCY", 0.5))
+        return FacialAnalyzer(gemini_llm=StubChatModel(latency), llama_client=StubOpenAIClient(latency),
+                              llama_async_client=StubAsyncOpenAIClient(latency))
+    return FacialAnalyzer(preprocessor=ImagePreprocessor())
+
+
+def warm_clients(analyzer):
+    """Create the provider clients (and import their SDKs) before the first request."""
+    analyzer.gemini_llm
+    if analyzer.llama_async_client is None:
+        get_registry().llama_async()
+    if analyzer.llama_client is None:
+        get_registry().llama()
+
+
+class AssessmentService:
+    def __init__(self, analyzer=None, workers=None, max_pending=None, max_upload_bytes=None):
+        self.analyzer = analyzer
+        self.workers = workers if workers is not None else int(os.getenv("SERVICE_WORKERS", 8))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("SERVICE_MAX_PENDING", 256))
+        self.max_upload_bytes = (max_upload_bytes if max_upload_bytes is not None
+                                 else int(os.getenv("SERVICE_MAX_UPLOAD_BYTES", 10 * 1024 * 1024)))
+        self.queue = None
+        self.metrics = PrometheusSink()
+        self._startup_lock = asyncio.Lock()
+
+    async def startup(self):
+        async with self._startup_lock:
+            if self.queue is not None:
+                return
+            if self.analyzer is None:
+                self.analyzer = build_analyzer()
+            await asyncio.to_thread(warm_clients, self.analyzer)
+            set_sink(self.metrics)
+            queue = JobQueue(self.analyzer, workers=self.workers, max_pending=self.max_pending)
+            await queue.start()
+            self.queue = queue
+
+    async def shutdown(self):
+        if self.queue is not None:
+            await self.queue.stop()
+            self.queue = None
+        await get_registry().aclose()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if self.queue is None:
+            # Servers that skip the lifespan protocol still get a working service
+            await self.startup()
+        try:
+            await self._route(scope, receive, send)
+        except HTTPError as e:
+            await send_json(send, e.status, {"error": str(e)}, e.headers)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _route(self, scope, receive, send):
+        method, path = scope["method"], scope["path"]
+
+        if path == "/healthz" and method == "GET":
+            await send_json(send, 200, {"status": "ok", **self.queue.stats()})
+            return
+        if path == "/metrics" and method == "GET":
+            await send_response(send, 200, self.metrics.render().encode(),
+                                "text/plain; version=0.0.4; charset=utf-8")
+            return
+        if path == "/assessments" and method == "POST":
+            await self._submit(receive, send)
+            return
+
+        match = _USER_IMAGES.match(path)
+        if match and method in ("PUT", "POST"):
+            await self._upload(scope, receive, send, match.group(1))
+            return
+        match = _JOB.match(path)
+        if match and method == "GET":
+            await send_json(send, 200, self._job(match.group(1)).to_dict())
+            return
+        match = _JOB_EVENTS.match(path)
+        if match and method == "GET":
+            await self._events(send, self._job(match.group(1)))
+            return
+        raise HTTPError(404, "not found")
+
+    def _job(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            raise HTTPError(404, "unknown or expired job")
+        return job
+
+    async def _submit(self, receive, send):
+        try:
+            body = json.loads(await read_body(receive, 64 * 1024) or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        if not isinstance(body, dict) or "user_id" not in body:
+            raise HTTPError(400, "body needs a 'user_id'")
+        count = body.get("count", 3)
+        if not isinstance(count, int) or not 3 <= count <= MAX_IMAGES:
+            raise HTTPError(400, f"'count' must be an integer from 3 to {MAX_IMAGES}")
+        try:
+            # Validates the id before queueing, so bad input fails fast
+            user_upload_dir(body["user_id"], self.analyzer.uploads_root)
+            job = self.queue.submit(body["user_id"], count)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        except QueueFullError as e:
+            raise HTTPError(503, str(e), [(b"retry-after", b"1")])
+        await send_json(send, 202, job.to_dict(), [(b"location", f"/assessments/{job.id}".encode())])
+
+    async def _upload(self, scope, receive, send, user_id):
+        content_type = header(scope, b"content-type").split(";")[0].strip().lower()
+        extension = UPLOAD_EXTENSIONS.get(content_type)
+        if extension is None:
+            raise HTTPError(415, f"expected one of {sorted(UPLOAD_EXTENSIONS)}")
+        data = await read_body(receive, self.max_upload_bytes)
+        if not data:
+            raise HTTPError(400, "empty upload")
+        try:
+            path = await asyncio.to_thread(store_upload, user_id, data, extension, self.analyzer.uploads_root)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        await send_json(send, 201, {"user_id": user_id, "image": os.path.basename(path)})
+
+    async def _events(self, send, job):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+        ]})
+        async for event in job.follow():
+            await send({"type": "http.response.body", "more_body": True,
+                        "body": f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()})
+        if job.status == "failed":
+            await send({"type": "http.response.body", "more_body": True,
+                        "body": f"event: error\ndata: {json.dumps({'error': job.error})}\n\n".encode()})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+async def read_body(receive, limit):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise HTTPError(413, f"body larger than {limit} bytes")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def send_response(send, status, body, content_type, headers=None):
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode()), *(headers or []),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, data, headers=None):
+    await send_response(send, status, json.dumps(data).encode(), "application/json", headers)
+
+
+app = AssessmentService()
@@ -0,0 +1,98 @@
+"""
+Interval Join Benchmark
+
+Checks EventIndex against masking the whole log once per session (how
+create_windows used to find each session's events) on labels that overlap,
+come out of order, and include reversed or missing bounds, then times both
+as the number of labeled sessions grows.
+
+Usage:
+    python bench_interval_join.py --events 2000000 --sessions 1000 10000 50000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from interval_join import EventIndex, label_coverage
+
+def synthetic_labels(timestamps, num_sessions, seed=0):
+    """Sessions at random times, so they overlap and are not in time order"""
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(timestamps.min(), timestamps.max(), num_sessions).astype(np.float64)
+    ends = starts + rng.integers(-10_000, 600_000, num_sessions)  # A few end before they start
+    starts[rng.random(num_sessions) < 0.01] = np.nan
+    return pd.DataFrame({
+        'start_timestamp': starts,
+        'end_timestamp': ends,
+        'label': rng.integers(0, 2, num_sessions),
+    })
+
+def masked_join(timestamps, labels):
+    """Reference: one boolean mask over every event per session"""
+    events, sessions = [], []
+    coverage = np.zeros(len(timestamps), dtype=np.int64)
+    for i, (start, end) in enumerate(zip(labels['start_timestamp'], labels['end_timestamp'])):
+        mask = (timestamps >= start) & (timestamps <= end)
+        rows = np.flatnonzero(mask)
+        events.append(rows[np.argsort(timestamps[rows], kind='stable')])
+        sessions.append(np.full(len(rows), i))
+        coverage += mask
+    return np.concatenate(events), np.concatenate(sessions), coverage
+
+def check(timestamps, labels):
+    index = EventIndex(timestamps)
+    events, sessions = index.join(labels['start_timestamp'], labels['end_timestamp'])
+    expected_events, expected_sessions, expected_coverage = masked_join(timestamps, labels)
+
+    assert (events == expected_events).all() and (sessions == expected_sessions).all(), "join differs"
+    assert (index.counts(labels['start_timestamp'], labels['end_timestamp']) ==
+            np.bincount(expected_sessions, minlength=len(labels))).all(), "counts differ"
+    coverage, _ = label_coverage(index, labels)
+    assert (coverage == expected_coverage).all(), "coverage differs"
+    return len(events)
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the interval join")
+    parser.add_argument('--events', type=int, default=2_000_000)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[100, 1_000, 10_000])
+    args = parser.parse_args()
+
+    print("="*60)
+    print("INTERVAL JOIN BENCHMARK")
+    print("="*60)
+
+    rng = np.random.default_rng(0)
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.integers(50, 2000, args.events))
+    rng.shuffle(timestamps)
+
+    small = timestamps[:20_000]
+    for dtype in (np.int64, np.float64):
+        matches = check(small.astype(dtype), synthetic_labels(small, 300, seed=1))
+        print(f"\n✓ Join, counts and coverage match masking ({np.dtype(dtype).name} timestamps, {matches:,} matches)")
+
+    print(f"\n{args.events:,} events")
+    for num_sessions in args.sessions:
+        labels = synthetic_labels(timestamps, num_sessions)
+        starts, ends = labels['start_timestamp'], labels['end_timestamp']
+
+        def indexed():
+            return EventIndex(timestamps).join(starts, ends)
+
+        (events, _), index_seconds = timed(indexed)
+        # Masking is timed on a sample of sessions and scaled up
+        sample = labels.iloc[:min(num_sessions, 200)]
+        _, mask_seconds = timed(masked_join, timestamps, sample)
+        mask_seconds *= num_sessions / len(sample)
+        print(f"  {num_sessions:7,} sessions: EventIndex {index_seconds:7.2f}s  "
+              f"masking ~{mask_seconds:8.1f}s  ({mask_seconds / index_seconds:,.0f}x, {len(events):,} matches)")
+
+if __name__ == "__main__":
+    main()
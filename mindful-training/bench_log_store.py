@@ -0,0 +1,93 @@
+"""
+Log Store Benchmark
+
+Writes synthetic scroll logs as the old append-only CSV, migrates them to
+the Parquet store, and compares file sizes and load times: the whole CSV
+with pd.read_csv, the whole store, and the store limited to the labeled
+sessions with only the columns preprocessing uses.
+
+Usage:
+    python bench_log_store.py --events 10000000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import log_store
+from bench_preprocess import synthetic_data
+
+PACKAGES = ['com.instagram.android', 'com.google.android.youtube', 'com.zhiliaoapp.musically', 'com.android.chrome']
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Parquet log store")
+    parser.add_argument('--events', type=int, default=10_000_000)
+    parser.add_argument('--label-days', type=float, default=0.25,
+                        help="Fraction of days with labeled sessions")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("LOG STORE BENCHMARK")
+    print("="*60)
+
+    logs, labels = synthetic_data(args.events)
+    rng = np.random.default_rng(0)
+    logs['package_name'] = np.array(PACKAGES)[rng.integers(0, len(PACKAGES), len(logs))]
+    # The CSV is append-only, so it is in export (time) order
+    logs = logs[log_store.COLUMNS].sort_values('timestamp')
+    # Sessions get labeled on some days, not spread evenly over all of them
+    days = labels['start_timestamp'] // log_store.DAY_MS
+    labeled_days = days.drop_duplicates().sample(frac=args.label_days, random_state=0)
+    labels = labels[days.isin(labeled_days)]
+    ranges = list(labels[['start_timestamp', 'end_timestamp']].itertuples(index=False))
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        os.chdir(root)
+        try:
+            Path("dataset").mkdir()
+            logs.to_csv(log_store.RAW_LOGS_FILE, index=False)
+            csv_size = log_store.RAW_LOGS_FILE.stat().st_size
+
+            csv_logs, csv_seconds = timed(pd.read_csv, log_store.RAW_LOGS_FILE)
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, migrate_seconds = timed(log_store.migrate_csv)
+            files = list(log_store.LOGS_DIR.rglob("*.parquet"))
+            store_size = sum(path.stat().st_size for path in files)
+
+            all_logs, all_seconds = timed(log_store.read_logs)
+            labeled, labeled_seconds = timed(log_store.read_logs, ranges,
+                                             columns=['timestamp', 'scroll_delta_y', 'velocity'])
+        finally:
+            os.chdir(cwd)
+
+    assert len(all_logs) == len(csv_logs)
+    inside = np.zeros(len(csv_logs), dtype=bool)
+    ts = csv_logs['timestamp'].to_numpy()
+    for start, end in ranges:
+        inside |= (ts >= start) & (ts <= end)
+    assert len(labeled) == inside.sum(), f"{len(labeled)} events read, {inside.sum()} in labeled sessions"
+
+    print(f"\n{args.events:,} events, {len(files)} Parquet files, "
+          f"{len(ranges):,} labeled sessions ({inside.mean():.0%} of events)")
+    print(f"  CSV size             : {csv_size / 1e6:8.1f} MB")
+    print(f"  Parquet size         : {store_size / 1e6:8.1f} MB  ({csv_size / store_size:.1f}x smaller)")
+    print(f"  migration            : {migrate_seconds:8.2f}s")
+    print(f"  pd.read_csv          : {csv_seconds:8.2f}s")
+    print(f"  read_logs()          : {all_seconds:8.2f}s  ({csv_seconds / all_seconds:.1f}x)")
+    print(f"  read_logs(labeled)   : {labeled_seconds:8.2f}s  ({csv_seconds / labeled_seconds:.1f}x)")
+
+if __name__ == "__main__":
+    main()
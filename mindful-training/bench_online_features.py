@@ -0,0 +1,113 @@
+"""
+Online Feature Benchmark
+
+Checks WindowAccumulator against calculate_window_features on random
+windows (including missing velocities, zero deltas and repeated
+timestamps), checks StreamingWindows against the offline windows of
+create_windows, and measures streaming throughput in events per second.
+
+Usage:
+    python bench_online_features.py --events 2000000
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_preprocess import synthetic_data
+from online_features import FEATURE_COLUMNS, StreamingWindows, WindowAccumulator, stream_features
+from preprocess_data import WINDOW_SIZE_MS, calculate_window_features, create_windows
+
+INTEGER_FEATURES = ['direction_changes', 'total_scrolls']
+
+def assert_same(actual, expected, context):
+    for col in FEATURE_COLUMNS:
+        a, e = float(actual[col]), float(expected[col])
+        if col in INTEGER_FEATURES:
+            assert a == e, f"{context}: {col} {a} != {e}"
+        elif np.isnan(e):
+            assert np.isnan(a), f"{context}: {col} {a} != NaN"
+        else:
+            assert np.isclose(a, e, rtol=1e-9, atol=1e-9), f"{context}: {col} {a} != {e}"
+
+def check_accumulator(num_windows, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(num_windows):
+        n = int(rng.integers(1, 300))
+        events = pd.DataFrame({
+            'timestamp': 1_700_000_000_000 + np.cumsum(rng.integers(0, 2000, n)),  # 0 = repeated
+            'scroll_delta_y': rng.choice([-300.0, -12.5, 0.0, 7.0, 480.0], n) * rng.uniform(0.5, 2, n),
+            'velocity': rng.uniform(0, 5000, n),
+        })
+        events.loc[rng.random(n) < 0.05, 'velocity'] = np.nan
+        events.loc[rng.random(n) < 0.1, 'scroll_delta_y'] = 0.0
+
+        window = WindowAccumulator()
+        for row in events.itertuples(index=False):
+            window.add(row.timestamp, row.scroll_delta_y, row.velocity)
+        assert_same(window.features(), calculate_window_features(events), f"window {i}")
+    return num_windows
+
+def check_streaming(logs, window_ms, stride_ms):
+    """Treat the whole log as one session and compare every full window"""
+    logs = logs.sort_values('timestamp', kind='stable')
+    origin = int(logs['timestamp'].iloc[0])
+    last_full = (int(logs['timestamp'].iloc[-1]) - origin - window_ms) // stride_ms
+    session_end = origin + last_full * stride_ms + window_ms
+    labels = pd.DataFrame({'start_timestamp': [origin], 'end_timestamp': [session_end], 'label': [0]})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = create_windows(logs, labels, window_ms, stride_ms)
+    events = zip(logs['timestamp'].tolist(), logs['scroll_delta_y'].tolist(), logs['velocity'].tolist())
+    streamed = [features for start, end, features in stream_features(events, window_ms, stride_ms)
+                if end <= session_end]
+
+    assert len(streamed) == len(expected), f"{len(streamed)} windows, expected {len(expected)}"
+    for i, (actual, (_, row)) in enumerate(zip(streamed, expected.iterrows())):
+        assert_same(actual, row, f"window {i}")
+    return len(streamed)
+
+def throughput(events, make_sink):
+    sink = make_sink()
+    start = time.perf_counter()
+    for timestamp, scroll_delta_y, velocity in events:
+        sink.add(timestamp, scroll_delta_y, velocity)
+    return len(events) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark online feature extraction")
+    parser.add_argument('--events', type=int, default=2_000_000)
+    parser.add_argument('--windows', type=int, default=500, help="Random windows for the parity check")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("ONLINE FEATURE BENCHMARK")
+    print("="*60)
+
+    checked = check_accumulator(args.windows)
+    print(f"\n✓ WindowAccumulator matches calculate_window_features on {checked} random windows")
+
+    logs, _ = synthetic_data(50_000, seed=2)
+    for window_ms, stride_ms in [(WINDOW_SIZE_MS, WINDOW_SIZE_MS), (30000, 5000)]:
+        checked = check_streaming(logs, window_ms, stride_ms)
+        print(f"✓ StreamingWindows matches create_windows ({window_ms / 1000:g}s window, "
+              f"{stride_ms / 1000:g}s stride, {checked:,} windows)")
+
+    logs, _ = synthetic_data(args.events)
+    logs = logs.sort_values('timestamp', kind='stable')
+    events = list(zip(logs['timestamp'].tolist(), logs['scroll_delta_y'].tolist(), logs['velocity'].tolist()))
+
+    print(f"\nThroughput over {len(events):,} events (one Python process):")
+    rate = throughput(events, WindowAccumulator)
+    print(f"  WindowAccumulator.add        : {rate / 1e6:5.2f}M events/s")
+    rate = throughput(events, lambda: StreamingWindows(WINDOW_SIZE_MS))
+    print(f"  StreamingWindows 30s         : {rate / 1e6:5.2f}M events/s")
+    rate = throughput(events, lambda: StreamingWindows(30000, 5000))
+    print(f"  StreamingWindows 30s / 5s    : {rate / 1e6:5.2f}M events/s")
+
+if __name__ == "__main__":
+    main()
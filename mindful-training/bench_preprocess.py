@@ -0,0 +1,150 @@
+"""
+Preprocessing Benchmark
+
+Times create_windows on synthetic scroll logs and checks it against the
+original per-session, per-window loop on a smaller slice of the same data,
+for back-to-back and overlapping windows. Also times several window
+configurations computed together with create_window_sets.
+
+Usage:
+    python bench_preprocess.py --events 10000000 --window 30 --window 30:5
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocess_data import (FEATURE_COLUMNS, WINDOW_SIZE_MS, calculate_window_features, config_name,
+                             create_window_sets, create_windows, parse_window_config)
+
+INTEGER_FEATURES = ['direction_changes', 'total_scrolls']
+
+def synthetic_data(num_events, seed=0):
+    """
+    Scroll logs shaped like the app's exports: bursts of swipes ~50-2000 ms
+    apart, with labeled sessions of 1-10 minutes covering most of the time
+    """
+    rng = np.random.default_rng(seed)
+
+    timestamps = 1_700_000_000_000 + np.cumsum(rng.integers(50, 2000, num_events))
+    deltas = rng.integers(-900, 900, num_events)
+    logs = pd.DataFrame({
+        'timestamp': timestamps,
+        'scroll_delta_y': deltas,
+        'scroll_delta_x': rng.integers(-50, 50, num_events),
+        'package_name': 'com.example.feed',
+        'duration': rng.integers(30, 400, num_events),
+        'velocity': np.abs(deltas) / rng.uniform(0.05, 0.5, num_events),
+    })
+    # Shuffle so the benchmark pays for the sort, like a merged export would
+    logs = logs.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    starts = []
+    t = int(timestamps[0])
+    while t < timestamps[-1]:
+        starts.append(t)
+        t += int(rng.integers(60_000, 660_000))
+    starts = np.array(starts)
+    lengths = rng.integers(60_000, 600_000, len(starts))
+    labels = pd.DataFrame({
+        'start_timestamp': starts,
+        'end_timestamp': starts + lengths,
+        'label': rng.integers(0, 2, len(starts)),
+        'notes': '',
+    })
+    return logs, labels
+
+def loop_windows(logs, labels, window_ms=WINDOW_SIZE_MS, stride_ms=WINDOW_SIZE_MS):
+    """The original implementation, a boolean mask per session and per window, with a stride"""
+    all_features = []
+
+    for _, label_row in labels.iterrows():
+        start_time = label_row['start_timestamp']
+        end_time = label_row['end_timestamp']
+
+        session_events = logs[(logs['timestamp'] >= start_time) & (logs['timestamp'] <= end_time)]
+        if len(session_events) < 3:
+            continue
+
+        num_windows = max(1, int((end_time - start_time - window_ms) / stride_ms) + 1)
+        for i in range(num_windows):
+            window_start = start_time + (i * stride_ms)
+            window_end = min(window_start + window_ms, end_time)
+            window_events = session_events[
+                (session_events['timestamp'] >= window_start) &
+                (session_events['timestamp'] <= window_end)
+            ]
+            if len(window_events) >= 3:
+                features = calculate_window_features(window_events)
+                features['label'] = label_row['label']
+                all_features.append(features)
+
+    return pd.DataFrame(all_features)
+
+def check_parity(logs, labels, window_ms=WINDOW_SIZE_MS, stride_ms=WINDOW_SIZE_MS):
+    """Compare create_windows with the loop; returns the worst relative difference"""
+    expected = loop_windows(logs, labels, window_ms, stride_ms)
+    actual = create_windows(logs, labels, window_ms, stride_ms)
+
+    assert list(actual.columns) == list(expected.columns), "column order differs"
+    assert len(actual) == len(expected), f"{len(actual)} windows, expected {len(expected)}"
+    for col in INTEGER_FEATURES + ['label']:
+        assert (actual[col].to_numpy() == expected[col].to_numpy()).all(), f"{col} differs"
+
+    worst = 0.0
+    for col in FEATURE_COLUMNS:
+        if col in INTEGER_FEATURES:
+            continue
+        a = actual[col].to_numpy(dtype=float)
+        e = expected[col].to_numpy(dtype=float)
+        assert (np.isnan(a) == np.isnan(e)).all(), f"{col} NaNs differ"
+        ok = ~np.isnan(e)
+        rel = np.abs(a[ok] - e[ok]) / np.maximum(np.abs(e[ok]), 1e-12)
+        assert np.allclose(a[ok], e[ok], rtol=1e-9, atol=1e-9), f"{col} differs (max rel {rel.max():.2e})"
+        worst = max(worst, rel.max() if len(rel) else 0.0)
+    return len(expected), worst
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark window creation")
+    parser.add_argument('--events', type=int, default=10_000_000)
+    parser.add_argument('--parity-events', type=int, default=200_000,
+                        help="Events used for the comparison with the original loop")
+    parser.add_argument('--window', action='append', type=parse_window_config, metavar='SIZE[:STRIDE]',
+                        help="Window configurations in seconds (default: 30, 30:5, 60:10)")
+    args = parser.parse_args()
+    configs = args.window or [(30000, 30000), (30000, 5000), (60000, 10000)]
+
+    print("="*60)
+    print("PREPROCESSING BENCHMARK")
+    print("="*60)
+
+    logs, labels = synthetic_data(args.parity_events, seed=1)
+    for window_ms, stride_ms in configs:
+        windows, worst = check_parity(logs, labels, window_ms, stride_ms)
+        print(f"\n✓ Parity on {args.parity_events:,} events, {config_name(window_ms, stride_ms)}: "
+              f"{windows:,} windows identical (float features within {worst:.1e} relative)")
+
+    _, loop_seconds = timed(loop_windows, logs, labels)
+    _, fast_seconds = timed(create_windows, logs, labels)
+    print(f"\n  original loop : {loop_seconds:8.2f}s")
+    print(f"  create_windows: {fast_seconds:8.2f}s  ({loop_seconds / fast_seconds:.0f}x)")
+
+    logs, labels = synthetic_data(args.events)
+    features, seconds = timed(create_windows, logs, labels)
+    print(f"\n✓ {args.events:,} events, {len(labels):,} sessions -> {len(features):,} windows "
+          f"in {seconds:.2f}s ({args.events / seconds / 1e6:.1f}M events/s)")
+
+    window_sets, seconds = timed(create_window_sets, logs, labels, configs, False)
+    print(f"\n✓ {len(configs)} configurations in one pass: {seconds:.2f}s")
+    for config, features in window_sets.items():
+        print(f"  {config_name(*config):28s}: {len(features):10,} windows")
+
+if __name__ == "__main__":
+    main()
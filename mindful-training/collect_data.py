@@ -8,31 +8,23 @@ Run this while using the app and label your behavior.
 import subprocess
 import time
 import csv
+import json
 from datetime import datetime
 from pathlib import Path
 
 # Configuration
 DATASET_DIR = Path("dataset")
-RAW_LOGS_FILE = DATASET_DIR / "raw_logs.csv"
+RAW_LOGS_FILE = DATASET_DIR / "raw_logs.csv"  # Legacy logs, migrated by log_store.py
+RAW_LOGS_DIR = DATASET_DIR / "raw_logs"  # Parquet log store
 LABELS_FILE = DATASET_DIR / "labels.csv"
+WATERMARK_FILE = DATASET_DIR / "export_watermark.json"  # Newest exported event
+EXPORT_BATCH_SIZE = 50_000  # Rows fetched from SQLite at a time
 
 # Create dataset directory
 DATASET_DIR.mkdir(exist_ok=True)
 
 def init_csv_files():
-    """Initialize CSV files with headers"""
-    if not RAW_LOGS_FILE.exists():
-        with open(RAW_LOGS_FILE, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'timestamp',
-                'scroll_delta_y',
-                'scroll_delta_x',
-                'package_name',
-                'duration',
-                'velocity'
-            ])
-    
+    """Initialize the labels CSV with headers (raw logs go to the Parquet store)"""
     if not LABELS_FILE.exists():
         with open(LABELS_FILE, 'w', newline='') as f:
             writer = csv.writer(f)
@@ -65,34 +57,93 @@ def pull_data_from_device():
         print("  3. App has stored some data")
         return False
 
+def load_watermark():
+    """
+    Export state: 'timestamp' of the newest exported event (None before the
+    first export) and the number of events 'exported' so far
+    """
+    if not WATERMARK_FILE.exists():
+        return {'timestamp': None, 'exported': 0}
+    with open(WATERMARK_FILE, 'r') as f:
+        return json.load(f)
+
+def save_watermark(state):
+    # Written to a temp file and renamed, so a crash never leaves half a file
+    state = dict(state, updated=datetime.now().isoformat(timespec='seconds'))
+    tmp_file = WATERMARK_FILE.with_suffix('.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    tmp_file.replace(WATERMARK_FILE)
+
 def export_data_from_db():
-    """Export data from SQLite database to CSV"""
+    """
+    Export new events from the SQLite database to the Parquet log store
+
+    Only events at or after the watermark (the newest timestamp already
+    exported) are read, in batches of EXPORT_BATCH_SIZE. Events at exactly
+    the watermark timestamp are checked against the store so none is
+    written twice; the watermark only moves once the write has finished.
+    """
     import sqlite3
+    import numpy as np
+    import pandas as pd
+    import log_store
     
     db_path = DATASET_DIR / "mindful_database"
     if not db_path.exists():
         print("Database file not found!")
         return
     
-    conn = sqlite3.connect(str(db_path))
+    # Older exports were appended to a CSV; move them over first
+    if RAW_LOGS_FILE.exists() and not log_store.has_logs():
+        log_store.migrate_csv(RAW_LOGS_FILE)
+    
+    state = load_watermark()
+    watermark = state['timestamp']
+    if watermark is None:
+        # Exports before the watermark existed copied the whole table
+        watermark = log_store.max_timestamp()
+    
+    # The writer pulls batches from its own thread, one at a time
+    conn = sqlite3.connect(str(db_path), check_same_thread=False)
     cursor = conn.cursor()
     
-    # Get all gesture events
+    # Get gesture events not exported yet
     cursor.execute("""
         SELECT timestamp, scrollDeltaY, scrollDeltaX, packageName, duration, velocity
         FROM gesture_events
+        WHERE timestamp >= ?
         ORDER BY timestamp
-    """)
+    """, (watermark if watermark is not None else float('-inf'),))
     
-    rows = cursor.fetchall()
+    # Events at exactly the watermark may have been exported already
+    stored = np.array([], dtype=np.uint64)
+    if watermark is not None and log_store.has_logs():
+        stored = log_store.row_hashes(log_store.read_logs([(watermark, watermark)]))
+    newest = watermark
     
-    # Append to raw logs
-    with open(RAW_LOGS_FILE, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
+    def batches():
+        nonlocal newest
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                return
+            batch = pd.DataFrame(rows, columns=log_store.COLUMNS)
+            at_watermark = (batch['timestamp'] == watermark).to_numpy()
+            if at_watermark.any():
+                batch = batch[~(at_watermark & np.isin(log_store.row_hashes(batch), stored))]
+            if len(batch):
+                newest = int(batch['timestamp'].max())
+                yield log_store.to_table(batch)
+    
+    try:
+        written = log_store.write_tables(batches())
+    finally:
+        conn.close()
     
-    conn.close()
-    print(f"✓ Exported {len(rows)} events to {RAW_LOGS_FILE}")
+    if newest is not None and (written or state['timestamp'] is None):
+        save_watermark({'timestamp': newest, 'exported': state['exported'] + written})
+    print(f"✓ Exported {written} new events to {RAW_LOGS_DIR} (watermark {newest})")
 
 def label_session():
     """Interactive session labeling"""
@@ -138,15 +189,40 @@ def show_menu():
     print("\n1. Pull data from device")
     print("2. Label a session")
     print("3. View statistics")
-    print("4. Exit")
+    print("4. Compact raw logs (remove duplicates)")
+    print("5. Exit")
     print()
 
+def count_labeled_events():
+    """
+    Events inside labeled sessions, events inside more than one session,
+    and events whose sessions disagree on the label
+    """
+    import pandas as pd
+    from interval_join import EventIndex, label_coverage
+    
+    labels = pd.read_csv(LABELS_FILE)
+    if RAW_LOGS_DIR.is_dir():
+        import log_store
+        # Only the labeled time ranges are read from the store
+        ranges = labels[['start_timestamp', 'end_timestamp']].dropna().itertuples(index=False)
+        timestamps = log_store.read_logs(ranges, columns=['timestamp'])['timestamp']
+    else:
+        timestamps = pd.read_csv(RAW_LOGS_FILE, usecols=['timestamp'])['timestamp']
+    
+    coverage, conflicting = label_coverage(EventIndex(timestamps.to_numpy()), labels)
+    return int((coverage > 0).sum()), int((coverage > 1).sum()), int(conflicting.sum())
+
 def show_statistics():
     """Show current dataset statistics"""
     try:
         # Count raw logs
-        with open(RAW_LOGS_FILE, 'r') as f:
-            raw_count = sum(1 for _ in f) - 1  # Exclude header
+        if RAW_LOGS_DIR.is_dir():
+            import log_store
+            raw_count = log_store.open_dataset().count_rows()
+        else:
+            with open(RAW_LOGS_FILE, 'r') as f:
+                raw_count = sum(1 for _ in f) - 1  # Exclude header
         
         # Count labels
         with open(LABELS_FILE, 'r') as f:
@@ -165,6 +241,14 @@ def show_statistics():
         print()
         
         if label_count > 0:
+            labeled, overlapping, conflicting = count_labeled_events()
+            print(f"Events in labeled sessions: {labeled}")
+            if overlapping:
+                print(f"  - In overlapping sessions: {overlapping}")
+            if conflicting:
+                print(f"⚠ Warning: {conflicting} events are labeled both normal and addictive.")
+            print()
+            
             balance = min(normal_count, addictive_count) / max(normal_count, addictive_count)
             print(f"Class balance: {balance:.2%}")
             if balance < 0.5:
@@ -192,6 +276,9 @@ def main():
         elif choice == '3':
             show_statistics()
         elif choice == '4':
+            import log_store
+            log_store.compact()
+        elif choice == '5':
             print("Goodbye!")
             break
         else:
@@ -0,0 +1,140 @@
+"""
+Feature Cache
+
+Remembers the feature windows of every labeled session between runs of
+preprocess_data.py, so adding one session to labels.csv only computes that
+session's windows. There is one cache file per window configuration under
+dataset/feature_cache/.
+
+A session is a hit when its (start, end, label) and the hash of its events
+all match the cache; editing a label, moving a bound or exporting new events
+into the session makes it a miss and it is recomputed.
+"""
+
+import pickle
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from online_features import FEATURE_COLUMNS
+
+DATASET_DIR = Path("dataset")
+CACHE_DIR = DATASET_DIR / "feature_cache"
+CACHE_VERSION = 1  # Bump when the features change, to drop old caches
+
+SESSION_KEY = ['start_timestamp', 'end_timestamp', 'label']
+KEY_COLUMNS = SESSION_KEY + ['events_hash']
+HASHED_COLUMNS = ['timestamp', 'scroll_delta_y', 'velocity']
+
+def event_hash_prefix(logs, index):
+    """
+    Prefix sums (mod 2**64) of a per-event hash, in sorted event order. The
+    hash of the events in sorted range [a, b) is prefix[b] - prefix[a], so
+    every session is hashed in O(1) whatever its length. Values are hashed
+    as float64, so the CSV log and the Parquet store give the same hashes.
+    """
+    events = logs[HASHED_COLUMNS].astype(np.float64)
+    hashes = pd.util.hash_pandas_object(events, index=False).to_numpy()[index.order]
+    prefix = np.zeros(len(hashes) + 1, dtype=np.uint64)
+    np.cumsum(hashes, out=prefix[1:])  # Wraps around, as intended
+    return prefix
+
+def session_keys(labels, index, prefix):
+    """Cache key columns for each labeled session, indexed like labels"""
+    a, b = index.slices(labels['start_timestamp'], labels['end_timestamp'])
+    keys = labels[SESSION_KEY].copy()
+    keys['events_hash'] = prefix[b] - prefix[a]
+    return keys
+
+def cache_file(window_ms, stride_ms):
+    return CACHE_DIR / f"w{window_ms / 1000:g}s_s{stride_ms / 1000:g}s.pkl"
+
+def load_cache(window_ms, stride_ms):
+    """Cached sessions and windows for one configuration, or None"""
+    path = cache_file(window_ms, stride_ms)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get('version') != CACHE_VERSION:
+            return None
+        cache['sessions'] = cache['sessions'][KEY_COLUMNS]
+        cache['windows'] = cache['windows'][KEY_COLUMNS + ['window'] + FEATURE_COLUMNS]
+        seconds_per_session, batch_size = cache['timing']
+    except Exception as e:
+        # Truncated, from another pandas version, or not a cache at all:
+        # recomputing is always safe, so never let it stop preprocessing
+        print(f"⚠ Ignoring unreadable feature cache {path}: {type(e).__name__}: {e}")
+        return None
+    return cache
+
+def save_cache(window_ms, stride_ms, cache):
+    path = cache_file(window_ms, stride_ms)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+
+def cached_windows(labels, keys, window_ms, stride_ms, compute):
+    """
+    Feature windows for every labeled session, in the same order as
+    computing them all: label order, then window order.
+
+    `compute(labels)` computes the windows of the sessions missing from the
+    cache and returns them with a 'session' column holding the label index.
+    The cache is rewritten with exactly the current sessions, so removed
+    sessions drop out of it.
+    """
+    cache = load_cache(window_ms, stride_ms)
+    keys = keys.reset_index(names='session')
+    if cache is None:
+        hit = np.zeros(len(keys), dtype=bool)
+        cached = None
+    else:
+        hit = keys.merge(cache['sessions'].assign(cached=True), on=KEY_COLUMNS, how='left')['cached']
+        hit = hit.notna().to_numpy()
+        cached = keys[hit].merge(cache['windows'], on=KEY_COLUMNS)
+
+    # Seconds per session, timed on the largest batch computed so far, so a
+    # run that recomputes one session does not skew the estimate
+    timing = (0.0, 0) if cache is None else cache['timing']
+    missed = keys[~hit]
+    computed = None
+    if len(missed):
+        start = time.perf_counter()
+        computed = compute(labels.loc[missed['session']]).drop(columns='label')
+        if len(missed) >= timing[1]:
+            timing = ((time.perf_counter() - start) / len(missed), len(missed))
+        computed['window'] = computed.groupby('session').cumcount()
+        computed = computed.merge(missed, on='session')
+
+    parts = [df for df in (cached, computed) if df is not None and len(df)]
+    if parts:
+        windows = pd.concat(parts, ignore_index=True)
+        position = labels.index.get_indexer(windows['session'])
+        windows = windows.iloc[np.lexsort((windows['window'].to_numpy(), position))]
+    else:
+        windows = keys.iloc[:0].assign(window=0, **{column: 0.0 for column in FEATURE_COLUMNS})
+
+    sessions = keys[KEY_COLUMNS].drop_duplicates()
+    if len(missed) or cache is None or len(cache['sessions']) != len(sessions):
+        cached_rows = windows[KEY_COLUMNS + ['window'] + FEATURE_COLUMNS]
+        if len(sessions) < len(keys):
+            cached_rows = cached_rows.drop_duplicates(KEY_COLUMNS + ['window'])
+        save_cache(window_ms, stride_ms, {
+            'version': CACHE_VERSION,
+            'sessions': sessions,
+            'windows': cached_rows,
+            'timing': timing,
+        })
+
+    hits = int(hit.sum())
+    print(f"✓ Feature cache: {hits}/{len(keys)} sessions cached, {len(missed)} computed "
+          f"(saved ~{hits * timing[0]:.2f}s)")
+
+    features = windows[FEATURE_COLUMNS + ['label']].reset_index(drop=True)
+    return features
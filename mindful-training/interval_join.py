@@ -0,0 +1,114 @@
+"""
+Interval Join
+
+Matches scroll events to labeled sessions, or any other [start, end]
+intervals. Events are sorted by timestamp once; each interval then covers a
+contiguous slice of the sorted events, found with two binary searches. The
+intervals can overlap and come in any order, as rows in labels.csv do.
+Joining m intervals to n events costs O(n log n + m log n + matches)
+instead of a pass over every event for every interval.
+"""
+
+import numpy as np
+
+class EventIndex:
+    """
+    Event timestamps sorted once for repeated interval lookups. Events
+    without a timestamp are left out; `order` maps sorted positions back to
+    rows of the input.
+    """
+
+    def __init__(self, timestamps):
+        timestamps = np.asarray(timestamps)
+        rows = np.arange(len(timestamps))
+        if timestamps.dtype.kind == 'f':
+            rows = rows[~np.isnan(timestamps)]
+        self.order = rows[np.argsort(timestamps[rows], kind='stable')]
+        self.timestamps = timestamps[self.order]
+        self.size = len(timestamps)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def slices(self, starts, ends):
+        """
+        Sorted-event ranges [a, b) of the events with start <= timestamp <= end
+        for each interval; intervals with a missing or reversed bound are empty
+        """
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        missing = np.isnan(starts) | np.isnan(ends)
+        if self.timestamps.dtype.kind in 'iu':
+            # Search in the events' own dtype rather than converting all of
+            # them; for whole-number timestamps t >= s <=> t >= ceil(s)
+            starts = np.ceil(np.where(missing, 0, starts)).astype(self.timestamps.dtype)
+            ends = np.floor(np.where(missing, 0, ends)).astype(self.timestamps.dtype)
+        a = np.searchsorted(self.timestamps, starts, side='left')
+        b = np.searchsorted(self.timestamps, ends, side='right')
+        b = np.where(missing | (b < a), a, b)
+        return a, b
+
+    def counts(self, starts, ends):
+        """Number of events in each interval"""
+        a, b = self.slices(starts, ends)
+        return b - a
+
+    def join(self, starts, ends):
+        """
+        Every (event, interval) match as two arrays of input row positions,
+        grouped by interval in input order, events in time order within one.
+        An event inside several overlapping intervals appears once for each.
+        """
+        a, b = self.slices(starts, ends)
+        n = b - a
+        interval_rows = np.repeat(np.arange(len(a)), n)
+        # Position of each match within its interval: 0, 1, ..., n - 1
+        offsets = np.arange(len(interval_rows)) - np.repeat(np.cumsum(n) - n, n)
+        return self.order[np.repeat(a, n) + offsets], interval_rows
+
+    def coverage(self, starts, ends):
+        """
+        How many intervals contain each event, by input row (0 for events
+        without a timestamp). Uses a difference array over the sorted events,
+        so it costs O(n + m log n) however much the intervals overlap.
+        """
+        a, b = self.slices(starts, ends)
+        delta = np.zeros(len(self.timestamps) + 1, dtype=np.int64)
+        np.add.at(delta, a, 1)
+        np.add.at(delta, b, -1)
+        coverage = np.zeros(self.size, dtype=np.int64)
+        coverage[self.order] = np.cumsum(delta[:-1])
+        return coverage
+
+def merge_intervals(intervals):
+    """Sort (start, end) intervals and merge the ones that overlap; drops reversed ones"""
+    merged = []
+    for start, end in sorted((int(start), int(end)) for start, end in intervals if end >= start):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+def in_intervals(timestamps, merged):
+    """Mask of timestamps inside any of the merged (start, end) intervals, inclusive"""
+    timestamps = np.asarray(timestamps)
+    if not merged:
+        return np.zeros(len(timestamps), dtype=bool)
+    starts, ends = np.array(merged).T
+    index = np.searchsorted(starts, timestamps, side='right') - 1
+    return (index >= 0) & (timestamps <= ends[np.maximum(index, 0)])
+
+def label_coverage(index, labels):
+    """
+    Per event: number of labeled sessions containing it, and whether those
+    sessions disagree on the label. Returns (coverage, conflicting) arrays
+    by input row.
+    """
+    coverage = np.zeros(index.size, dtype=np.int64)
+    labels_seen = np.zeros(index.size, dtype=np.int64)
+    for _, sessions in labels.groupby('label'):
+        covered = index.coverage(sessions['start_timestamp'], sessions['end_timestamp'])
+        coverage += covered
+        labels_seen += covered > 0
+    return coverage, labels_seen > 1
@@ -0,0 +1,349 @@
+"""
+Columnar Storage for Raw Scroll Logs
+
+Raw scroll events are kept as a Parquet dataset under dataset/raw_logs/,
+partitioned by day (UTC) and package_name:
+
+    raw_logs/day=2025-10-20/package_name=com.instagram.android/part-<id>-0.parquet
+
+Columns have fixed dtypes and every file is sorted by timestamp, so a read
+limited to the labeled time ranges only opens the matching partitions and
+skips row groups outside the ranges using their min/max statistics.
+
+Usage:
+    python log_store.py migrate     # one-shot import of dataset/raw_logs.csv
+    python log_store.py compact     # drop duplicate events, one file per partition
+    python log_store.py info
+"""
+
+import argparse
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from interval_join import in_intervals, merge_intervals
+
+# Configuration
+DATASET_DIR = Path("dataset")
+RAW_LOGS_FILE = DATASET_DIR / "raw_logs.csv"
+LOGS_DIR = DATASET_DIR / "raw_logs"
+
+DAY_MS = 86_400_000
+ROW_GROUP_SIZE = 16_384  # Rows per row group, the unit timestamp filters can skip
+MAX_RANGES = 8  # Timestamp filter terms; partitions are pruned by exact day
+
+COLUMNS = ['timestamp', 'scroll_delta_y', 'scroll_delta_x', 'package_name', 'duration', 'velocity']
+
+SCHEMA = pa.schema([
+    ('timestamp', pa.int64()),  # Epoch milliseconds
+    ('scroll_delta_y', pa.float64()),
+    ('scroll_delta_x', pa.float64()),
+    ('duration', pa.int64()),
+    ('velocity', pa.float64()),
+])
+PARTITION_SCHEMA = pa.schema([
+    ('day', pa.string()),
+    ('package_name', pa.string()),
+])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+# Dtypes for reading the CSV logs; duration is nullable until it is written
+CSV_DTYPES = {
+    'timestamp': 'float64',
+    'scroll_delta_y': 'float64',
+    'scroll_delta_x': 'float64',
+    'package_name': 'string',
+    'duration': 'float64',
+    'velocity': 'float64',
+}
+
+# Nullable dtypes every source converts to before rows are compared
+HASH_DTYPES = {
+    'timestamp': 'Int64',
+    'scroll_delta_y': 'float64',
+    'scroll_delta_x': 'float64',
+    'package_name': 'string',
+    'duration': 'Int64',
+    'velocity': 'float64',
+}
+
+def has_logs():
+    """True once anything has been written to the store"""
+    return LOGS_DIR.is_dir() and any(LOGS_DIR.rglob("*.parquet"))
+
+def open_dataset():
+    return ds.dataset(LOGS_DIR, format='parquet', partitioning=PARTITIONING,
+                      schema=pa.unify_schemas([SCHEMA, PARTITION_SCHEMA]))
+
+def day_of(timestamps):
+    """UTC day ('YYYY-MM-DD') of epoch-millisecond timestamps"""
+    days, index = np.unique(np.asarray(timestamps) // DAY_MS, return_inverse=True)
+    return days.astype('datetime64[D]').astype(str)[index]
+
+def to_table(logs):
+    """
+    Convert a frame of raw logs to the store's schema, dropping events
+    without a timestamp (they cannot be placed in a window or a partition)
+    """
+    logs = logs[logs['timestamp'].notna()].sort_values('timestamp', kind='stable')
+    timestamps = logs['timestamp'].to_numpy().astype(np.int64)
+
+    arrays = {
+        'timestamp': pa.array(timestamps, pa.int64()),
+        'scroll_delta_y': pa.array(logs['scroll_delta_y'], pa.float64(), from_pandas=True),
+        'scroll_delta_x': pa.array(logs['scroll_delta_x'], pa.float64(), from_pandas=True),
+        'duration': pa.array(pd.to_numeric(logs['duration']).astype('Int64'), pa.int64(), from_pandas=True),
+        'velocity': pa.array(logs['velocity'], pa.float64(), from_pandas=True),
+        'day': pa.array(day_of(timestamps), pa.string()),
+        'package_name': pa.array(logs['package_name'].astype('string'), pa.string(), from_pandas=True),
+    }
+    return pa.table(arrays, schema=pa.unify_schemas([SCHEMA, PARTITION_SCHEMA]))
+
+def write_tables(tables):
+    """
+    Write tables in the store's schema as one new file per partition;
+    returns rows written. Files from earlier writes are left untouched.
+    """
+    written = 0
+
+    def batches():
+        nonlocal written
+        for table in tables:
+            written += table.num_rows
+            yield from table.to_batches()
+
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        batches(), LOGS_DIR, schema=pa.unify_schemas([SCHEMA, PARTITION_SCHEMA]),
+        format=file_format, partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=file_format.make_write_options(compression='zstd'),
+        min_rows_per_group=ROW_GROUP_SIZE, max_rows_per_group=ROW_GROUP_SIZE,
+    )
+    return written
+
+def append_logs(logs):
+    """Write a frame of raw logs to the store; returns rows written"""
+    table = to_table(logs)
+    if table.num_rows == 0:
+        return 0
+    return write_tables([table])
+
+def cover_ranges(ranges, max_ranges=MAX_RANGES):
+    """
+    Close the smallest gaps between merged ranges until at most `max_ranges`
+    remain. The result covers every input range, so a filter built from it
+    never drops an event that is needed.
+    """
+    if len(ranges) <= max_ranges:
+        return ranges
+    gaps = np.array([ranges[i + 1][0] - ranges[i][1] for i in range(len(ranges) - 1)])
+    # Keep the largest gaps as the split points
+    splits = np.sort(np.argsort(gaps)[len(gaps) - (max_ranges - 1):])
+    covered, first = [], 0
+    for split in splits:
+        covered.append((ranges[first][0], ranges[split][1]))
+        first = split + 1
+    covered.append((ranges[first][0], ranges[-1][1]))
+    return covered
+
+def ranges_filter(ranges):
+    """
+    Dataset filter covering the merged (start, end) ranges, for partition and
+    row group pruning; it may let through events between nearby ranges
+    """
+    if not ranges:
+        return ds.scalar(False)
+
+    days = set()
+    for start, end in ranges:
+        days.update(day_of(np.arange(start // DAY_MS, end // DAY_MS + 1) * DAY_MS))
+
+    timestamp = ds.field('timestamp')
+    expression = None
+    for start, end in cover_ranges(ranges):
+        term = (timestamp >= start) & (timestamp <= end)
+        expression = term if expression is None else expression | term
+
+    # The day filter prunes whole partitions before any file is opened; the
+    # timestamp terms let row group statistics skip more within a day
+    return ds.field('day').isin(sorted(days)) & expression
+
+def read_logs(ranges=None, columns=None):
+    """
+    Load raw logs as a DataFrame, optionally only events inside the given
+    (start, end) timestamp ranges (inclusive) and only the given columns
+    """
+    columns = columns or COLUMNS
+    if ranges is None:
+        return open_dataset().to_table(columns=columns).to_pandas()
+
+    ranges = merge_intervals(ranges)
+    scan_columns = columns if 'timestamp' in columns else ['timestamp'] + list(columns)
+    table = open_dataset().to_table(columns=scan_columns, filter=ranges_filter(ranges))
+    keep = in_intervals(table['timestamp'].to_numpy(), ranges)
+    return table.filter(keep).select(columns).to_pandas()
+
+def max_timestamp():
+    """Newest event timestamp in the store, or None when it is empty"""
+    if not has_logs():
+        return None
+    return pc.max(open_dataset().to_table(columns=['timestamp'])['timestamp']).as_py()
+
+def row_hashes(logs):
+    """
+    One hash per event over all columns, after converting them to the
+    store's dtypes, so the same event hashes the same from SQLite, CSV or
+    Parquet
+    """
+    return pd.util.hash_pandas_object(logs[COLUMNS].astype(HASH_DTYPES), index=False).to_numpy()
+
+def compact_store():
+    """
+    Rewrite each partition as a single timestamp-sorted file without
+    duplicate events. The new file is written before the old ones are
+    removed, so an interrupted run leaves duplicates, never gaps; running
+    it again finishes the job. Returns (events before, events after).
+    """
+    before = after = 0
+    file_format = ds.ParquetFileFormat()
+    for partition in sorted(LOGS_DIR.glob("day=*/package_name=*")):
+        files = sorted(partition.glob("*.parquet"))
+        if not files:
+            continue
+        table = ds.dataset(files, format=file_format, schema=SCHEMA).to_table()
+        logs = table.to_pandas()
+        unique = logs[~pd.Series(pd.util.hash_pandas_object(logs, index=False)).duplicated().to_numpy()]
+        before += len(logs)
+        after += len(unique)
+        if len(files) == 1 and len(unique) == len(logs):
+            continue
+
+        unique = unique.sort_values('timestamp', kind='stable')
+        compacted = pa.Table.from_pandas(unique, schema=SCHEMA, preserve_index=False)
+        pq.write_table(compacted, partition / f"part-{uuid.uuid4().hex}-0.parquet",
+                       compression='zstd', row_group_size=ROW_GROUP_SIZE)
+        for path in files:
+            path.unlink()
+    return before, after
+
+def compact_csv(csv_path=RAW_LOGS_FILE, chunksize=1_000_000):
+    """
+    Drop duplicate events from an append-only CSV log in place, keeping the
+    first copy and the file's order. Rows are compared as text, which is how
+    repeated exports duplicated them. Returns (events before, events after).
+
+    Kept rows are remembered as a sorted array of 64-bit hashes, 8 bytes
+    per unique event; each chunk is looked up with a binary search and its
+    new hashes merged in.
+    """
+    csv_path = Path(csv_path)
+    compacted = csv_path.with_name(csv_path.name + ".compacting")
+    seen = np.empty(0, dtype=np.uint64)
+    before = after = 0
+    header = True
+    for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        if len(seen):
+            position = np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)
+            keep &= seen[position] != hashes
+        # Two sorted runs, which the stable sort merges in linear time
+        seen = np.sort(np.concatenate([seen, np.sort(hashes[keep])]), kind='stable')
+        chunk[keep].to_csv(compacted, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        before += len(chunk)
+        after += int(keep.sum())
+    compacted.replace(csv_path)
+    return before, after
+
+def migrate_csv(csv_path=RAW_LOGS_FILE, chunksize=1_000_000, force=False):
+    """One-shot import of the append-only CSV logs into the store"""
+    print("Migrating CSV logs to Parquet...")
+
+    if not Path(csv_path).exists():
+        print(f"✗ {csv_path} not found")
+        return 0
+    if has_logs():
+        if not force:
+            print(f"✗ {LOGS_DIR} already has data; use --force to rebuild it from {csv_path}")
+            return 0
+        shutil.rmtree(LOGS_DIR)
+
+    def tables():
+        for chunk in pd.read_csv(csv_path, dtype=CSV_DTYPES, chunksize=chunksize):
+            yield to_table(chunk)
+            print(f"  {len(chunk):,} events read")
+
+    # One write for every chunk, so each partition ends up as one file
+    total = write_tables(tables())
+
+    csv_size = Path(csv_path).stat().st_size
+    store_size = sum(path.stat().st_size for path in LOGS_DIR.rglob("*.parquet")) if total else 0
+    # Renamed so the events are not read (or migrated) twice
+    migrated = Path(csv_path).with_name(Path(csv_path).name + ".migrated")
+    Path(csv_path).rename(migrated)
+
+    print(f"✓ Migrated {total:,} events to {LOGS_DIR}")
+    print(f"  {csv_size / 1e6:.1f} MB CSV -> {store_size / 1e6:.1f} MB Parquet")
+    print(f"  Original CSV kept as {migrated}")
+    return total
+
+def compact(csv_path=RAW_LOGS_FILE):
+    """Deduplicate the store and, if it is still around, the CSV log"""
+    print("Compacting raw logs...")
+    if has_logs():
+        before, after = compact_store()
+        print(f"✓ {LOGS_DIR}: removed {before - after:,} duplicate events, {after:,} left")
+    if Path(csv_path).exists():
+        before, after = compact_csv(csv_path)
+        print(f"✓ {csv_path}: removed {before - after:,} duplicate events, {after:,} left")
+
+def show_info():
+    """Show what the store holds"""
+    if not has_logs():
+        print(f"No Parquet logs in {LOGS_DIR}")
+        return
+
+    files = list(LOGS_DIR.rglob("*.parquet"))
+    # Partition values come from the directory names: day=.../package_name=.../file
+    days = sorted({path.parent.parent.name.partition('=')[2] for path in files})
+    packages = {path.parent.name for path in files}
+
+    print("\n" + "="*50)
+    print("PARQUET LOG STORE")
+    print("="*50)
+    print(f"Events   : {open_dataset().count_rows():,}")
+    print(f"Files    : {len(files):,} ({sum(path.stat().st_size for path in files) / 1e6:.1f} MB)")
+    print(f"Days     : {len(days)} ({days[0]} to {days[-1]})")
+    print(f"Packages : {len(packages)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet storage for raw scroll logs")
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser('migrate', help=f"Import {RAW_LOGS_FILE} into {LOGS_DIR}")
+    migrate_parser.add_argument('--csv', type=Path, default=RAW_LOGS_FILE)
+    migrate_parser.add_argument('--force', action='store_true', help="Replace logs already in the store")
+    compact_parser = commands.add_parser('compact', help="Drop duplicate events and merge small files")
+    compact_parser.add_argument('--csv', type=Path, default=RAW_LOGS_FILE,
+                                help="Also compact this CSV log if it still exists")
+    commands.add_parser('info', help="Show what the store holds")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_csv(args.csv, force=args.force)
+    elif args.command == 'compact':
+        compact(args.csv)
+    else:
+        show_info()
+
+if __name__ == "__main__":
+    main()
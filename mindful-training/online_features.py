@@ -0,0 +1,169 @@
+"""
+Online Feature Extraction
+
+The eight window features of calculate_window_features, computed one event
+at a time in constant memory, for scoring a live scroll stream. Uses only
+the standard library so the same code can run next to the model at
+inference time.
+
+Events must arrive in timestamp order, as the device records them.
+"""
+
+import math
+from collections import deque
+
+# Feature order shared by preprocessing, training and scoring
+FEATURE_COLUMNS = [
+    'avg_scroll_velocity', 'scroll_frequency', 'direction_changes', 'avg_inter_scroll_delay',
+    'avg_scroll_distance', 'scroll_variance', 'total_scrolls', 'window_duration_seconds',
+]
+MIN_EVENTS = 3  # Minimum events per session and per window
+
+def _sign(value):
+    if value != value:  # NaN, like np.sign
+        return value
+    return (value > 0) - (value < 0)
+
+class WindowAccumulator:
+    """
+    Running state for one window: O(1) work per event.
+
+    Velocity and distance use running sums (NaN values are skipped, as
+    pandas does), scroll_variance uses Welford's update for the sample
+    standard deviation of |scroll_delta_y|, and the inter-scroll delay only
+    needs the first and last timestamps, since the delays sum to the span.
+    """
+
+    __slots__ = ('count', 'first_timestamp', 'last_timestamp', 'last_direction', 'direction_changes',
+                 'velocity_sum', 'velocity_count', 'distance_count', 'distance_mean', 'distance_m2')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.last_direction = None
+        self.direction_changes = 0
+        self.velocity_sum = 0.0
+        self.velocity_count = 0
+        self.distance_count = 0
+        self.distance_mean = 0.0
+        self.distance_m2 = 0.0
+
+    def add(self, timestamp, scroll_delta_y, velocity):
+        if self.count and timestamp < self.last_timestamp:
+            raise ValueError(f"event at {timestamp} arrived after {self.last_timestamp}")
+        if not self.count:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.count += 1
+
+        direction = _sign(scroll_delta_y)
+        if self.count > 1 and direction != self.last_direction:
+            self.direction_changes += 1
+        self.last_direction = direction
+
+        if velocity == velocity:
+            self.velocity_sum += velocity
+            self.velocity_count += 1
+
+        distance = abs(scroll_delta_y)
+        if distance == distance:
+            self.distance_count += 1
+            delta = distance - self.distance_mean
+            self.distance_mean += delta / self.distance_count
+            self.distance_m2 += delta * (distance - self.distance_mean)
+
+    def features(self):
+        """Current feature values, as calculate_window_features would give; None when empty"""
+        if not self.count:
+            return None
+
+        n = self.count
+        time_span_ms = self.last_timestamp - self.first_timestamp
+        return {
+            'avg_scroll_velocity': self.velocity_sum / self.velocity_count if self.velocity_count else math.nan,
+            'scroll_frequency': (n / time_span_ms) * 60000 if time_span_ms > 0 else 0,
+            'direction_changes': self.direction_changes,
+            'avg_inter_scroll_delay': time_span_ms / (n - 1) if n > 1 else 0,
+            'avg_scroll_distance': self.distance_mean if self.distance_count else math.nan,
+            'scroll_variance': (math.sqrt(max(self.distance_m2, 0.0) / (self.distance_count - 1))
+                                if self.distance_count > 1 else math.nan),
+            'total_scrolls': n,
+            'window_duration_seconds': time_span_ms / 1000.0,
+        }
+
+class StreamingWindows:
+    """
+    Windows over an unbounded event stream, with the same edges as the
+    offline windows: window k covers [origin + k*stride_ms, origin +
+    k*stride_ms + window_ms], both ends inclusive, and origin defaults to
+    the first event. Memory is one accumulator per open window, about
+    window_ms / stride_ms of them, however long the stream runs.
+    """
+
+    def __init__(self, window_ms, stride_ms=None, origin=None, min_events=MIN_EVENTS):
+        self.window_ms = window_ms
+        self.stride_ms = stride_ms or window_ms
+        self.origin = origin
+        self.min_events = min_events
+        self.open = {}  # window number -> WindowAccumulator
+        self.order = deque()  # open window numbers, oldest first
+        self.last_timestamp = None
+
+    def window_bounds(self, k):
+        start = self.origin + k * self.stride_ms
+        return start, start + self.window_ms
+
+    def add(self, timestamp, scroll_delta_y, velocity):
+        """
+        Add one event; returns the windows it closed as (start, end,
+        features) tuples, in window order
+        """
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError(f"event at {timestamp} arrived after {self.last_timestamp}")
+        self.last_timestamp = timestamp
+        if self.origin is None:
+            self.origin = timestamp
+
+        closed = self._close(timestamp)
+        offset = timestamp - self.origin
+        # Every window with start <= timestamp <= start + window_ms
+        first = max(0, math.ceil((offset - self.window_ms) / self.stride_ms))
+        last = math.floor(offset / self.stride_ms)
+        for k in range(first, last + 1):
+            window = self.open.get(k)
+            if window is None:
+                window = self.open[k] = WindowAccumulator()
+                self.order.append(k)
+            window.add(timestamp, scroll_delta_y, velocity)
+        return closed
+
+    def flush(self):
+        """Close every open window, e.g. at the end of a session"""
+        return self._close(math.inf)
+
+    def _close(self, timestamp):
+        closed = []
+        # Windows open in number order, and later windows end later
+        while self.order:
+            start, end = self.window_bounds(self.order[0])
+            if end >= timestamp:
+                break
+            window = self.open.pop(self.order.popleft())
+            if window.count >= self.min_events:
+                closed.append((start, end, window.features()))
+        return closed
+
+def stream_features(events, window_ms, stride_ms=None, origin=None):
+    """
+    Yield (start, end, features) for each window of an iterable of
+    (timestamp, scroll_delta_y, velocity) events, ending with the windows
+    still open when the events run out
+    """
+    windows = StreamingWindows(window_ms, stride_ms, origin)
+    for timestamp, scroll_delta_y, velocity in events:
+        yield from windows.add(timestamp, scroll_delta_y, velocity)
+    yield from windows.flush()
@@ -4,24 +4,41 @@ Data Preprocessing and Feature Engineering Script
 Converts raw scroll logs into ML-ready features
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
 
+from feature_cache import cached_windows, event_hash_prefix, session_keys
+from interval_join import EventIndex, label_coverage
+from online_features import FEATURE_COLUMNS, MIN_EVENTS
+
 # Configuration
 DATASET_DIR = Path("dataset")
 RAW_LOGS_FILE = DATASET_DIR / "raw_logs.csv"
+RAW_LOGS_DIR = DATASET_DIR / "raw_logs"  # Parquet store, see log_store.py
 LABELS_FILE = DATASET_DIR / "labels.csv"
 PROCESSED_FILE = DATASET_DIR / "processed_features.csv"
 WINDOW_SIZE_MS = 30000  # 30-second windows
 
 def load_data():
-    """Load raw logs and labels"""
+    """
+    Load raw logs and labels
+
+    Reads the Parquet log store when there is one, and then only the events
+    inside labeled sessions and the columns the features use; otherwise the
+    whole CSV log.
+    """
     print("Loading data...")
     
-    logs = pd.read_csv(RAW_LOGS_FILE)
     labels = pd.read_csv(LABELS_FILE)
+    if RAW_LOGS_DIR.is_dir():
+        from log_store import read_logs
+        ranges = labels[['start_timestamp', 'end_timestamp']].dropna().itertuples(index=False)
+        logs = read_logs(ranges, columns=['timestamp', 'scroll_delta_y', 'velocity'])
+    else:
+        logs = pd.read_csv(RAW_LOGS_FILE)
     
     print(f"✓ Loaded {len(logs)} scroll events")
     print(f"✓ Loaded {len(labels)} labeled sessions")
@@ -88,50 +105,215 @@ def calculate_window_features(events):
     
     return features
 
-def create_windows(logs, labels):
+def _cumsum0(values):
+    """Prefix sums with a leading zero, so values[i:j].sum() == p[j] - p[i]"""
+    dtype = np.int64 if values.dtype.kind in 'biu' else np.float64
+    out = np.zeros(len(values) + 1, dtype=dtype)
+    np.cumsum(values, out=out[1:])
+    return out
+
+def _column_prefix(values):
+    """
+    Prefix sums for windowed mean/std of one column, skipping NaN like pandas.
+
+    Integer columns are summed exactly. Float columns are centred on their
+    mean first, so the running sums stay small and rounding error does not
+    grow with the number of events.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'biu':
+        x = values.astype(np.int64)
+        return {'shift': 0, 'count': None, 'sum': _cumsum0(x), 'sumsq': _cumsum0(x * x)}
+
+    values = values.astype(np.float64)
+    valid = ~np.isnan(values)
+    shift = values[valid].mean() if valid.any() else 0.0
+    x = np.where(valid, values - shift, 0.0)
+    return {'shift': shift, 'count': _cumsum0(valid.astype(np.int64)), 'sum': _cumsum0(x), 'sumsq': _cumsum0(x * x)}
+
+def prepare_events(logs):
+    """
+    Sort the logs once by timestamp and precompute the prefix sums every
+    window feature is read from. Events with equal timestamps keep their
+    order in the log.
+    """
+    index = EventIndex(logs['timestamp'].to_numpy())
+    deltas = logs['scroll_delta_y'].to_numpy()[index.order]
+
+    directions = np.sign(deltas)
+    changes = directions[1:] != directions[:-1]
+
+    return {
+        'index': index,
+        'timestamp': index.timestamps,
+        'direction_changes': _cumsum0(changes.astype(np.int64)),
+        'velocity': _column_prefix(logs['velocity'].to_numpy()[index.order]),
+        'distance': _column_prefix(np.abs(deltas)),
+    }
+
+def _window_mean(prefix, a, b, n):
+    count = n if prefix['count'] is None else prefix['count'][b] - prefix['count'][a]
+    total = prefix['sum'][b] - prefix['sum'][a]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count + prefix['shift']
+
+def _window_std(prefix, a, b, n):
+    count = n if prefix['count'] is None else prefix['count'][b] - prefix['count'][a]
+    total = prefix['sum'][b] - prefix['sum'][a]
+    squares = prefix['sumsq'][b] - prefix['sumsq'][a]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if prefix['count'] is None:
+            # Exact integer numerator, one rounding in the division
+            variance = (count * squares - total * total) / (count * (count - 1))
+        else:
+            variance = np.maximum(squares - total * total / count, 0) / (count - 1)
+        variance = np.where(count > 1, variance, np.nan)
+    return np.sqrt(variance)
+
+def window_features(events, a, b):
+    """
+    Features for every window at once; window k covers the sorted events
+    a[k]:b[k]. Same definitions as calculate_window_features.
+    """
+    timestamps = events['timestamp']
+    n = b - a
+    time_span_ms = timestamps[b - 1] - timestamps[a]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scroll_frequency = np.where(time_span_ms > 0, (n / time_span_ms) * 60000, 0.0)
+        avg_inter_scroll_delay = np.where(n > 1, time_span_ms / (n - 1), 0.0)
+
+    return pd.DataFrame({
+        'avg_scroll_velocity': _window_mean(events['velocity'], a, b, n),
+        'scroll_frequency': scroll_frequency,
+        'direction_changes': events['direction_changes'][b - 1] - events['direction_changes'][a],
+        'avg_inter_scroll_delay': avg_inter_scroll_delay,
+        'avg_scroll_distance': _window_mean(events['distance'], a, b, n),
+        'scroll_variance': _window_std(events['distance'], a, b, n),
+        'total_scrolls': n,
+        'window_duration_seconds': time_span_ms / 1000.0,
+    }, columns=FEATURE_COLUMNS)
+
+def session_windows(labels, index, window_ms=WINDOW_SIZE_MS, stride_ms=None):
+    """
+    Event index ranges for every window of every labeled session.
+
+    Sessions with fewer than MIN_EVENTS events are skipped. Windows start at
+    the session start and every `stride_ms` after it (default: `window_ms`,
+    i.e. back-to-back windows) for as long as a whole window fits, with at
+    least one window per session; a window includes events on both of its
+    edges and never reaches past the session end. Sessions may overlap and
+    come in any order; each is windowed on its own. Returns (label index,
+    start index, end index) arrays in label order, then window order, with
+    start/end indexes into the sorted events of `index` (an EventIndex).
+    """
+    stride_ms = stride_ms or window_ms
+    labels = labels[labels['start_timestamp'].notna() & labels['end_timestamp'].notna()]
+    starts = labels['start_timestamp'].to_numpy()
+    ends = labels['end_timestamp'].to_numpy()
+
+    sessions = np.flatnonzero(index.counts(starts, ends) >= MIN_EVENTS)
+
+    duration = ends[sessions] - starts[sessions]
+    num_windows = np.maximum(1, np.trunc((duration - window_ms) / stride_ms).astype(np.int64) + 1)
+    session = np.repeat(sessions, num_windows)
+    # Position of each window within its session: 0, 1, ..., num_windows - 1
+    offsets = np.arange(len(session)) - np.repeat(np.cumsum(num_windows) - num_windows, num_windows)
+
+    window_start = starts[session] + offsets * stride_ms
+    window_end = np.minimum(window_start + window_ms, ends[session])
+    a, b = index.slices(window_start, window_end)
+    return labels.index.to_numpy()[session], a, b
+
+def windows_from_events(events, labels, window_ms=WINDOW_SIZE_MS, stride_ms=None, with_session=False):
+    """
+    Feature windows for one window configuration over prepared events.
+
+    Every feature is read from the prefix sums in `events`, so each window
+    costs O(1) however much it overlaps its neighbours. With `with_session`
+    a 'session' column gives the labels index each window came from.
+    """
+    label_index, a, b = session_windows(labels, events['index'], window_ms, stride_ms)
+
+    keep = (b - a) >= MIN_EVENTS
+    label_index, a, b = label_index[keep], a[keep], b[keep]
+
+    features = window_features(events, a, b)
+    features['label'] = labels['label'].loc[label_index].to_numpy()
+    if with_session:
+        features['session'] = label_index
+    return features
+
+def create_windows(logs, labels, window_ms=WINDOW_SIZE_MS, stride_ms=None):
     """
     Create sliding windows from raw logs with labels
+
+    The logs are sorted once and window boundaries are found with binary
+    search, so the cost is O(events log events + windows) rather than a scan
+    of the logs per session and per window.
     """
     print("\nCreating windows...")
-    
-    all_features = []
-    
-    for _, label_row in labels.iterrows():
-        start_time = label_row['start_timestamp']
-        end_time = label_row['end_timestamp']
-        label = label_row['label']
-        
-        # Get events in this session
-        session_events = logs[
-            (logs['timestamp'] >= start_time) & 
-            (logs['timestamp'] <= end_time)
-        ]
-        
-        if len(session_events) < 3:  # Need minimum events
-            continue
-        
-        # Create sliding windows within this session
-        session_duration = end_time - start_time
-        num_windows = max(1, int(session_duration / WINDOW_SIZE_MS))
-        
-        for i in range(num_windows):
-            window_start = start_time + (i * WINDOW_SIZE_MS)
-            window_end = window_start + WINDOW_SIZE_MS
-            
-            window_events = session_events[
-                (session_events['timestamp'] >= window_start) &
-                (session_events['timestamp'] <= window_end)
-            ]
-            
-            if len(window_events) >= 3:  # Minimum events per window
-                features = calculate_window_features(window_events)
-                if features:
-                    features['label'] = label
-                    all_features.append(features)
-    
-    print(f"✓ Created {len(all_features)} feature windows")
-    
-    return pd.DataFrame(all_features)
+
+    features = windows_from_events(prepare_events(logs), labels, window_ms, stride_ms)
+
+    print(f"✓ Created {len(features)} feature windows")
+
+    return features
+
+def check_label_overlaps(index, labels):
+    """Warn about events that fall in more than one labeled session"""
+    coverage, conflicting = label_coverage(index, labels)
+    overlapping = int((coverage > 1).sum())
+    if overlapping:
+        print(f"⚠ {overlapping} events fall in more than one labeled session "
+              f"({int(conflicting.sum())} of them under both labels)")
+        print("   Each session is windowed on its own, so these events appear in several windows.")
+
+def create_window_sets(logs, labels, configs, use_cache=True):
+    """
+    Feature windows for several (window_ms, stride_ms) configurations from
+    one sort of the logs; returns {config: features}
+
+    With `use_cache`, sessions whose bounds, label and events are unchanged
+    since the last run are read from the feature cache (see feature_cache.py)
+    and only new or changed sessions are computed.
+    """
+    print("\nCreating windows...")
+
+    events = prepare_events(logs)
+    check_label_overlaps(events['index'], labels)
+    if use_cache:
+        keys = session_keys(labels, events['index'], event_hash_prefix(logs, events['index']))
+    window_sets = {}
+    for window_ms, stride_ms in configs:
+        if use_cache:
+            def compute(sessions):
+                return windows_from_events(events, sessions, window_ms, stride_ms, with_session=True)
+            features = cached_windows(labels, keys, window_ms, stride_ms, compute)
+        else:
+            features = windows_from_events(events, labels, window_ms, stride_ms)
+        window_sets[(window_ms, stride_ms)] = features
+        print(f"✓ Created {len(features)} feature windows ({config_name(window_ms, stride_ms)})")
+
+    return window_sets
+
+def parse_window_config(text):
+    """'30' or '30:5' (seconds) -> (window_ms, stride_ms)"""
+    size, _, stride = text.partition(':')
+    window_ms = int(float(size) * 1000)
+    stride_ms = int(float(stride) * 1000) if stride else window_ms
+    if window_ms <= 0 or stride_ms <= 0:
+        raise ValueError(f"window size and stride must be positive: {text!r}")
+    return window_ms, stride_ms
+
+def config_name(window_ms, stride_ms):
+    return f"{window_ms / 1000:g}s window, {stride_ms / 1000:g}s stride"
+
+def output_file(window_ms, stride_ms):
+    """The default configuration keeps the file train_model.py reads"""
+    if (window_ms, stride_ms) == (WINDOW_SIZE_MS, WINDOW_SIZE_MS):
+        return PROCESSED_FILE
+    return DATASET_DIR / f"processed_features_w{window_ms / 1000:g}s_s{stride_ms / 1000:g}s.csv"
 
 def clean_features(df):
     """Clean and validate features"""
@@ -171,22 +353,16 @@ def show_feature_stats(df):
     
     print(f"\nTotal samples: {len(df)}")
 
-def main():
-    """Main preprocessing pipeline"""
-    print("="*60)
-    print("MINDFUL SCROLL - DATA PREPROCESSING")
+def save_features(features_df, window_ms, stride_ms):
+    """Clean, summarise and save one window configuration"""
+    print("\n" + "="*60)
+    print(config_name(window_ms, stride_ms).upper())
     print("="*60)
-    
-    # Load data
-    logs, labels = load_data()
-    
-    # Create features
-    features_df = create_windows(logs, labels)
-    
+
     if len(features_df) == 0:
         print("\n✗ No features created. Check your data!")
         return
-    
+
     # Clean features
     features_df = clean_features(features_df)
     
@@ -194,8 +370,9 @@ def main():
     show_feature_stats(features_df)
     
     # Save processed features
-    features_df.to_csv(PROCESSED_FILE, index=False)
-    print(f"\n✓ Saved processed features to {PROCESSED_FILE}")
+    path = output_file(window_ms, stride_ms)
+    features_df.to_csv(path, index=False)
+    print(f"\n✓ Saved processed features to {path}")
     
     # Check if ready for training
     if len(features_df) < 100:
@@ -212,8 +389,43 @@ def main():
         print(f"\n⚠ Warning: Classes are imbalanced (ratio: {balance:.2%})")
         print("   Recommendation: Collect more samples of the minority class.")
     
+    print(f"\n✓ Ready for training with {len(features_df)} samples")
+
+def main():
+    """
+    Main preprocessing pipeline
+
+    Each --window is SIZE or SIZE:STRIDE in seconds, e.g.
+
+        python preprocess_data.py --window 30 --window 30:5 --window 60:10
+
+    All configurations are computed from a single pass over the logs. The
+    default (30s back-to-back windows) is written to processed_features.csv;
+    any other configuration to processed_features_w<SIZE>s_s<STRIDE>s.csv.
+    Unchanged sessions come from the feature cache unless --no-cache is given.
+    """
+    parser = argparse.ArgumentParser(description="Convert raw scroll logs into ML-ready features")
+    parser.add_argument('--window', action='append', type=parse_window_config, metavar='SIZE[:STRIDE]',
+                        help=f"Window size and stride in seconds (default: {WINDOW_SIZE_MS // 1000})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every session instead of reusing cached windows")
+    args = parser.parse_args()
+    configs = list(dict.fromkeys(args.window or [(WINDOW_SIZE_MS, WINDOW_SIZE_MS)]))
+
+    print("="*60)
+    print("MINDFUL SCROLL - DATA PREPROCESSING")
+    print("="*60)
+    
+    # Load data
+    logs, labels = load_data()
+    
+    # Create features
+    window_sets = create_window_sets(logs, labels, configs, use_cache=not args.no_cache)
+    
+    for (window_ms, stride_ms), features_df in window_sets.items():
+        save_features(features_df, window_ms, stride_ms)
+    
     print("\n✓ Data preprocessing complete!")
-    print(f"  Ready for training with {len(features_df)} samples")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file